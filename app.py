@@ -1,66 +1,432 @@
 import os
+import json
+import math
+import time
 import asyncio
-from quart import Quart, render_template, request, jsonify
-from chinese_word_reinterpreter import ChineseWordReinterpreter
-from llm_adapter import get_llm_adapter
+import logging
+from quart import Quart, Response, render_template, request, jsonify, g
+from card_cache import CardResponseCache, EncodedCard
+from chinese_word_reinterpreter import ChineseWordReinterpreter, preload_pinyin
+from llm_adapter import get_llm_adapter, registry
+from provider_executor import executors
+from rate_limit import RateLimitExceeded, limiters
+from interpretation_cache import InterpretationCache
+from singleflight import SingleFlight
+from task_pool import map_unordered
+from logging_config import setup_logging, use_root_logging
+from metrics import REGISTRY, REQUEST_SECONDS, ERRORS, FALLBACKS, STAGE_SECONDS
+from raster import FORMATS as RASTER_FORMATS, NO_BACKEND as RASTER_NO_BACKEND, RASTER_SCALES, Rasterizer, RasterUnavailable
 from dotenv import load_dotenv
 
 # 加载环境变量
 load_dotenv()
+setup_logging()
+logger = logging.getLogger(__name__)
 
 app = Quart(__name__)
-interpreter = ChineseWordReinterpreter()
+
+# 批量接口：默认并发数、允许的最大并发数和单次最多词语数
+BATCH_DEFAULT_CONCURRENCY = int(os.getenv('BATCH_DEFAULT_CONCURRENCY', 8))
+BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', 32))
+BATCH_MAX_WORDS = int(os.getenv('BATCH_MAX_WORDS', 10000))
+# GET /card：浏览器/CDN 缓存时间（秒）和词语长度上限
+CARD_MAX_AGE = int(os.getenv('CARD_CACHE_MAX_AGE', 86400))
+CARD_MAX_WORD_LENGTH = int(os.getenv('CARD_MAX_WORD_LENGTH', 32))
+# GET /card/<model>/<word>.png|webp：默认缩放倍数
+RASTER_DEFAULT_SCALE = float(os.getenv('RASTER_DEFAULT_SCALE', 2))
+# GET /suggest：默认和最多返回的候选词数
+SUGGEST_DEFAULT_LIMIT = int(os.getenv('SUGGEST_DEFAULT_LIMIT', 10))
+SUGGEST_MAX_LIMIT = int(os.getenv('SUGGEST_MAX_LIMIT', 50))
+
+interpreter = ChineseWordReinterpreter(cache=InterpretationCache.from_env())
+# 合并同一时刻对相同 (模型, 词语) 的请求，只调用一次 LLM
+card_flights = SingleFlight()
+# GET /card 的已编码响应缓存
+card_responses = CardResponseCache.from_env()
+# PNG/WebP 导出的进程池和栅格缓存
+rasterizer = Rasterizer.from_env()
+
+async def generate_card(word, llm_adapter):
+    """生成解释并渲染 SVG 卡片"""
+    interpretation = await interpreter.interpret_word(word, llm_adapter)
+    logger.debug("生成的解释", extra={"word": word, "interpretation": interpretation})
+    svg_content = interpreter._create_svg_card(word, interpretation)
+    return interpretation, svg_content
+
+async def coalesced_card(word, llm_adapter):
+    return await card_flights.do(
+        (llm_adapter.name, word),
+        lambda: generate_card(word, llm_adapter)
+    )
+
+def _cache_stats():
+    if interpreter.cache is None:
+        return {}
+    stats = interpreter.cache.stats()
+    return {(event,): stats[event] for event in
+            ('memory_hits', 'disk_hits', 'misses', 'stores', 'memory_evictions', 'disk_evictions')}
+
+def _router_stats(field):
+    def collect():
+        adapter = registry.peek('auto')
+        if adapter is None:
+            return {}
+        return {(name,): stats[field] for name, stats in adapter.router.snapshot().items()}
+    return collect
+
+REGISTRY.callback('wordnew_cache_events_total', '解释缓存命中、未命中、写入和淘汰次数', ('event',),
+                  _cache_stats, type='counter')
+REGISTRY.callback('wordnew_cache_memory_items', '解释缓存内存层条目数', (),
+                  lambda: {(): interpreter.cache.stats()['memory_items']} if interpreter.cache else {})
+REGISTRY.callback('wordnew_lexicon_lookups_total', '词库单词查询的 LRU 命中和未命中次数', ('event',),
+                  lambda: {(event,): interpreter.lexicon.stats()[event] for event in ('hits', 'misses')},
+                  type='counter')
+REGISTRY.callback('wordnew_card_response_cache_total', 'GET /card 响应缓存命中（hits 为进程内，disk_hits 为共享持久层）、未命中和淘汰次数', ('event',),
+                  lambda: {(event,): value for event, value in card_responses.stats().items() if event != 'items'},
+                  type='counter')
+REGISTRY.callback('wordnew_raster_cache_total', '栅格缓存命中（hits 为进程内，disk_hits 为共享持久层）和未命中次数', ('event',),
+                  lambda: {(event,): rasterizer.cache.stats()[event] for event in ('hits', 'disk_hits', 'misses')},
+                  type='counter')
+REGISTRY.callback('wordnew_raster_pending', '正在栅格化的任务数', (), lambda: {(): rasterizer.pending})
+REGISTRY.callback('wordnew_singleflight_total', '卡片生成请求数：originating 为实际执行，coalesced 为合并等待',
+                  ('kind',), lambda: {('originating',): card_flights.originating,
+                                      ('coalesced',): card_flights.coalesced}, type='counter')
+REGISTRY.callback('wordnew_singleflight_in_flight', '正在执行的卡片生成数', (),
+                  lambda: {(): card_flights.in_flight()})
+REGISTRY.callback('wordnew_rate_limit_in_flight', '各提供商正在进行的 LLM 调用数', ('provider',),
+                  lambda: {(name,): limiter.in_flight for name, limiter in limiters().items()})
+REGISTRY.callback('wordnew_rate_limit_waiting', '各提供商限流队列中等待的请求数', ('provider',),
+                  lambda: {(name,): limiter.waiting for name, limiter in limiters().items()})
+REGISTRY.callback('wordnew_executor_queued', '同步 SDK 线程池中排队等待的任务数', ('provider',),
+                  lambda: {(name,): executor.queued for name, executor in executors().items()})
+REGISTRY.callback('wordnew_executor_running', '同步 SDK 线程池中正在执行的任务数', ('provider',),
+                  lambda: {(name,): executor.running for name, executor in executors().items()})
+REGISTRY.callback('wordnew_router_ewma_latency_seconds', 'auto 路由统计的各提供商 EWMA 延迟', ('provider',),
+                  _router_stats('ewma_latency'))
+REGISTRY.callback('wordnew_router_error_rate', 'auto 路由统计的各提供商 EWMA 错误率', ('provider',),
+                  _router_stats('error_rate'))
+
+@app.before_request
+async def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+async def record_request_time(response):
+    # 流式接口在响应头发出时记录，即首字节耗时
+    start = getattr(g, 'request_start', None)
+    if start is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - start,
+                                endpoint=request.endpoint or 'unknown', status=str(response.status_code))
+    return response
+
+@app.before_serving
+async def startup():
+    # 在后台线程加载拼音词典，不阻塞服务启动
+    if os.getenv('PRELOAD_PINYIN', '1') == '1':
+        asyncio.get_running_loop().run_in_executor(None, preload_pinyin)
+    
+    # 预先构建常用适配器，避免首个请求承担 SDK 初始化开销
+    for model in filter(None, os.getenv('LLM_PRELOAD_ADAPTERS', '').split(',')):
+        get_llm_adapter(model.strip())
+
+@app.after_serving
+async def shutdown():
+    await registry.aclose()
+    # 关闭共享缓存的连接，WAL 中的写入在最后一个连接关闭时合并回主文件
+    if interpreter.cache is not None:
+        interpreter.cache.close()
+    card_responses.close()
+    rasterizer.shutdown()
 
 @app.route('/')
 async def index():
     return await render_template('index.html')
 
+@app.route('/metrics')
+async def metrics():
+    """Prometheus 文本格式的指标"""
+    return REGISTRY.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+def rate_limited_response(e):
+    """本地限流拒绝时立即返回 503 和 Retry-After"""
+    retry_after = max(1, math.ceil(e.retry_after))
+    logger.info("限流拒绝请求", extra={"provider": e.provider, "retry_after": retry_after})
+    return jsonify({'error': '服务繁忙，请稍后再试', 'retry_after': retry_after}), 503, {'Retry-After': str(retry_after)}
+
 @app.route('/interpret', methods=['POST'])
 async def interpret():
     data = await request.get_json()
     word = data.get('word', '')
     model = data.get('model', 'zhipuai')  # 默认使用智谱AI
     
-    print(f"\n开始处理请求：词语 = {word}, 模型 = {model}")
+    logger.info("开始处理请求", extra={"word": word, "model": model})
     
     if not word:
         return jsonify({'error': '请输入词语'}), 400
     
     try:
         # 获取选择的LLM适配器
-        print(f"正在初始化 {model} 适配器...")
         llm_adapter = get_llm_adapter(model)
         if not llm_adapter:
             return jsonify({'error': '不支持的模型类型'}), 400
         
-        # 生成解释
-        print("开始生成解释...")
-        interpretation = await interpreter.interpret_word(word, llm_adapter)
-        print(f"生成的解释: {interpretation}")
-        
-        # 生成SVG
-        print("开始生成SVG...")
-        svg_content = interpreter._create_svg_card(word, interpretation)
-        print("SVG生成完成")
+        # 生成解释和SVG，相同请求并发到达时共享一次生成
+        _, svg_content = await coalesced_card(word, llm_adapter)
         
         return jsonify({
             'svg': svg_content
         })
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
     except Exception as e:
-        import traceback
-        print("\n发生错误:")
-        print(f"错误类型: {type(e)}")
-        print(f"错误信息: {str(e)}")
-        print("错误堆栈:")
-        print(traceback.format_exc())
+        logger.exception("生成卡片失败", extra={"word": word, "model": model})
+        ERRORS.inc(stage="interpret")
         return jsonify({'error': f'生成失败：{str(e)}'}), 500
 
+async def load_card(model, word):
+    """
+    取 GET /card 系列接口的卡片，返回 (EncodedCard, Cache-Control, 错误响应)
+
+    LLM 成功生成的卡片会长期缓存（CARD_CACHE_MAX_AGE），已编码的响应体保存在进程内 LRU 中，
+    SVG 同时写入工作进程共享的持久层；使用兜底解释的卡片只缓存很短时间，LLM 恢复后即可看到新内容。
+    """
+    if not word or len(word) > CARD_MAX_WORD_LENGTH:
+        return None, None, (jsonify({'error': f'词语长度应在 1 到 {CARD_MAX_WORD_LENGTH} 之间'}), 400)
+    llm_adapter = get_llm_adapter(model)
+    if not llm_adapter:
+        return None, None, (jsonify({'error': '不支持的模型类型'}), 404)
+
+    key = card_responses.make_key(llm_adapter.name, word)
+    encoded = card_responses.get(key)
+    if encoded is not None:
+        return encoded, f'public, max-age={CARD_MAX_AGE}', None
+    try:
+        interpretation, svg_content = await coalesced_card(word, llm_adapter)
+    except RateLimitExceeded as e:
+        return None, None, rate_limited_response(e)
+    except Exception as e:
+        logger.exception("生成卡片失败", extra={"word": word, "model": model})
+        ERRORS.inc(stage="card")
+        return None, None, (jsonify({'error': f'生成失败：{str(e)}'}), 500)
+    encoded = EncodedCard(svg_content)
+    # 只有词库预置解释和 LLM 成功生成（已写入解释缓存）的卡片才长期缓存
+    if interpretation == interpreter.curated_interpretation(word) or \
+            (interpreter.cache is not None and interpreter.cache.peek(word, llm_adapter.name) == interpretation):
+        card_responses.set(key, encoded)
+        return encoded, f'public, max-age={CARD_MAX_AGE}', None
+    return encoded, 'public, max-age=60', None
+
+@app.route('/card/<model>/<word>.svg')
+async def card(model, word):
+    """以 image/svg+xml 返回卡片，支持 ETag/If-None-Match 条件请求和 gzip/brotli 压缩"""
+    encoded, cache_control, error = await load_card(model, word)
+    if error is not None:
+        return error
+
+    encoding = encoded.negotiate(request.headers.get('Accept-Encoding'))
+    headers = {
+        'ETag': encoded.etag(encoding),
+        'Cache-Control': cache_control,
+        'Vary': 'Accept-Encoding',
+    }
+    if encoded.matches(request.headers.get('If-None-Match')):
+        return Response(b'', status=304, headers=headers)
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return Response(encoded.body(encoding), status=200, headers=headers, content_type='image/svg+xml; charset=utf-8')
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match 中是否包含 etag（忽略 W/ 前缀）"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or any((tag[2:] if tag.startswith('W/') else tag) == etag for tag in tags)
+
+@app.route('/card/<model>/<word>.png', defaults={'fmt': 'png'})
+@app.route('/card/<model>/<word>.webp', defaults={'fmt': 'webp'})
+async def card_raster(model, word, fmt):
+    """
+    以 PNG/WebP 返回卡片，参数 scale 为缩放倍数（RASTER_SCALES 之一，默认 RASTER_DEFAULT_SCALE）
+
+    栅格化在进程池中执行，结果按 (渲染器, SVG 哈希, 格式, 倍数) 缓存，同一张卡片的每种尺寸只栅格化一次。
+    没有可用后端时返回 501，渲染进程无法启动（如字体不含中文字形）时返回 503。
+    """
+    if not rasterizer.available():
+        return jsonify({'error': RASTER_NO_BACKEND}), 501
+    try:
+        scale = float(request.args.get('scale', RASTER_DEFAULT_SCALE))
+    except ValueError:
+        scale = None
+    if scale not in RASTER_SCALES:
+        return jsonify({'error': f"scale 必须是 {', '.join(f'{s:g}' for s in RASTER_SCALES)} 之一"}), 400
+
+    encoded, cache_control, error = await load_card(model, word)
+    if error is not None:
+        return error
+
+    # 同一 URL 的格式和倍数是固定的，ETag 区分卡片内容和渲染器（后端和字体），更换字体后客户端缓存失效
+    etag = f'"{encoded.digest}-{fmt}@{scale:g}-{rasterizer.renderer}"'
+    headers = {'ETag': etag, 'Cache-Control': cache_control}
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        return Response(b'', status=304, headers=headers)
+    try:
+        with STAGE_SECONDS.time(stage="rasterize"):
+            data = await rasterizer.render(encoded.identity, encoded.digest, fmt, scale)
+    except RasterUnavailable as e:
+        logger.error("栅格化不可用", extra={"word": word, "error": str(e)})
+        ERRORS.inc(stage="raster")
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        logger.exception("栅格化失败", extra={"word": word, "format": fmt, "scale": scale})
+        ERRORS.inc(stage="raster")
+        return jsonify({'error': f'栅格化失败：{str(e)}'}), 500
+    return Response(data, status=200, headers=headers, content_type=RASTER_FORMATS[fmt])
+
+@app.route('/suggest')
+async def suggest():
+    """
+    按前缀从本地词库返回候选词，按词频排序，不调用 LLM
+
+    参数：q（前缀）、limit（默认 SUGGEST_DEFAULT_LIMIT，最多 SUGGEST_MAX_LIMIT）
+    """
+    prefix = request.args.get('q', '').strip()
+    if not prefix or len(prefix) > CARD_MAX_WORD_LENGTH:
+        return jsonify({'error': f'q 的长度应在 1 到 {CARD_MAX_WORD_LENGTH} 之间'}), 400
+    try:
+        limit = int(request.args.get('limit', SUGGEST_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit 必须是整数'}), 400
+    limit = max(1, min(limit, SUGGEST_MAX_LIMIT))
+
+    suggestions = [
+        {'word': entry.word, 'pinyin': entry.pinyin, 'en': entry.en, 'ja': entry.ja,
+         'curated': entry.interpretation is not None}
+        for entry in interpreter.lexicon.suggest(prefix, limit)
+    ]
+    return jsonify({'suggestions': suggestions}), 200, {'Cache-Control': 'public, max-age=3600'}
+
+@app.route('/interpret/batch', methods=['POST'])
+async def interpret_batch():
+    """
+    批量生成卡片，按完成顺序以 NDJSON 逐行返回
+
+    请求体：{"words": [...], "model": "zhipuai", "concurrency": 8}
+    每行：{"index": 0, "word": ..., "interpretation": ..., "svg": ...}，失败时为 {"index", "word", "error"}，限流时另带 "retry_after"
+    """
+    data = await request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({'error': '请求体必须是 JSON 对象'}), 400
+    words = data.get('words')
+    model = data.get('model', 'zhipuai')
+    
+    if not isinstance(words, list) or not words or not all(isinstance(w, str) for w in words):
+        return jsonify({'error': 'words 必须是非空的词语列表'}), 400
+    if len(words) > BATCH_MAX_WORDS:
+        return jsonify({'error': f'单次最多处理 {BATCH_MAX_WORDS} 个词语'}), 400
+    try:
+        concurrency = int(data.get('concurrency', BATCH_DEFAULT_CONCURRENCY))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'concurrency 必须是整数'}), 400
+    concurrency = max(1, min(concurrency, BATCH_MAX_CONCURRENCY))
+    
+    llm_adapter = get_llm_adapter(model)
+    if not llm_adapter:
+        return jsonify({'error': '不支持的模型类型'}), 400
+    
+    logger.info("开始批量处理", extra={"count": len(words), "model": model, "concurrency": concurrency})
+    
+    async def process(item):
+        index, word = item
+        if not word:
+            return {'index': index, 'word': word, 'error': '请输入词语'}
+        try:
+            interpretation, svg_content = await coalesced_card(word, llm_adapter)
+            return {'index': index, 'word': word, 'interpretation': interpretation, 'svg': svg_content}
+        except RateLimitExceeded as e:
+            return {'index': index, 'word': word, 'error': '服务繁忙，请稍后再试',
+                    'retry_after': max(1, math.ceil(e.retry_after))}
+        except Exception as e:
+            logger.warning("批量生成失败", extra={"word": word, "model": model, "error": str(e)})
+            ERRORS.inc(stage="batch")
+            return {'index': index, 'word': word, 'error': f'生成失败：{str(e)}'}
+    
+    async def stream():
+        async for result in map_unordered(process, enumerate(words), concurrency):
+            yield json.dumps(result, ensure_ascii=False) + '\n'
+    
+    response = app.response_class(stream(), mimetype='application/x-ndjson')
+    # 大批量生成耗时可能超过默认的响应超时
+    response.timeout = None
+    return response
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+@app.route('/interpret/stream', methods=['GET', 'POST'])
+async def interpret_stream():
+    """
+    以 Server-Sent Events 流式返回解释和卡片
+
+    事件：delta（新增文本）、replace（LLM 失败时用兜底解释替换已输出内容）、
+    card（最终解释和 SVG）、error（生成失败，限流时带 retry_after）
+    """
+    if request.method == 'POST':
+        data = await request.get_json() or {}
+    else:
+        data = request.args
+    word = data.get('word', '')
+    model = data.get('model', 'zhipuai')
+    
+    if not word:
+        return jsonify({'error': '请输入词语'}), 400
+    
+    llm_adapter = get_llm_adapter(model)
+    if not llm_adapter:
+        return jsonify({'error': '不支持的模型类型'}), 400
+    
+    logger.info("开始流式处理", extra={"word": word, "model": model})
+    
+    async def stream():
+        parts = []
+        try:
+            async for delta in interpreter.stream_interpretation(word, llm_adapter):
+                parts.append(delta)
+                yield sse_event('delta', {'text': delta})
+            interpretation = ''.join(parts)
+        except RateLimitExceeded as e:
+            # 限流发生在首个分片之前，直接告知客户端稍后重试
+            yield sse_event('error', {'error': '服务繁忙，请稍后再试',
+                                      'retry_after': max(1, math.ceil(e.retry_after))})
+            return
+        except Exception as e:
+            logger.warning("流式生成解释失败，使用默认解释", extra={"word": word, "model": model, "error": str(e)})
+            FALLBACKS.inc(provider=llm_adapter.name)
+            interpretation = interpreter._generate_critical_interpretation(word)
+            yield sse_event('replace', {'text': interpretation})
+        
+        try:
+            svg_content = interpreter._create_svg_card(word, interpretation)
+            yield sse_event('card', {'interpretation': interpretation, 'svg': svg_content})
+        except Exception as e:
+            logger.exception("SVG生成失败", extra={"word": word})
+            ERRORS.inc(stage="stream")
+            yield sse_event('error', {'error': f'生成失败：{str(e)}'})
+    
+    response = app.response_class(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # 关闭反向代理缓冲，保证增量文本及时送达
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.timeout = None
+    return response
+
 if __name__ == '__main__':
+    # 开发模式：单进程并自动重载；生产环境使用 python serve.py
     import hypercorn.asyncio
     import hypercorn.config
     
     config = hypercorn.config.Config()
     config.bind = ["0.0.0.0:5000"]
     config.use_reloader = True
+    use_root_logging(config)
     
     asyncio.run(hypercorn.asyncio.serve(app, config))
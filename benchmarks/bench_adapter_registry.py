@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+对比每次请求新建适配器/会话与注册表复用长连接池的单请求耗时
+
+在本地启动一个兼容 DeepSeek 接口的 HTTP 服务，分别用两种方式发送请求：
+  - per-request: 每次请求构建新的 DeepSeekAdapter，并在结束后关闭其会话（旧行为）
+  - registry:    通过 get_llm_adapter 复用同一个适配器和连接池
+
+本地环回地址没有 TLS 握手和真实网络往返，实际部署中的节省会更大。
+
+用法：python benchmarks/bench_adapter_registry.py [--requests 500]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web
+
+from llm_adapter import DeepSeekAdapter, AdapterRegistry
+
+
+async def fake_completion(request):
+    await request.json()
+    return web.json_response({
+        "choices": [{"message": {"role": "assistant", "content": "用最快的速度完成错误的事情。"}}]
+    })
+
+
+async def start_server():
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", fake_completion)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/v1/chat/completions"
+
+
+async def run_per_request(url, n):
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        adapter = DeepSeekAdapter()
+        adapter.base_url = url
+        await adapter.generate_interpretation("效率")
+        await adapter.aclose()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def run_registry(url, n):
+    registry = AdapterRegistry()
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        adapter = registry.get("deepseek")
+        adapter.base_url = url
+        await adapter.generate_interpretation("效率")
+        timings.append(time.perf_counter() - start)
+    await registry.aclose()
+    return timings
+
+
+def report(label, timings):
+    ms = sorted(t * 1000 for t in timings)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    print(f"{label:<12} mean {statistics.mean(ms):7.3f} ms   p50 {statistics.median(ms):7.3f} ms   p95 {p95:7.3f} ms")
+    return statistics.mean(ms)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DEEPSEEK_API_KEY", "sk-benchmark")
+    runner, url = await start_server()
+    try:
+        # 适配器内部的调试输出会淹没结果，这里丢弃
+        with contextlib.redirect_stdout(io.StringIO()):
+            await run_registry(url, 10)
+            per_request = await run_per_request(url, args.requests)
+            pooled = await run_registry(url, args.requests)
+    finally:
+        await runner.cleanup()
+
+    print(f"{args.requests} 次顺序请求（本地环回）：")
+    old = report("per-request", per_request)
+    new = report("registry", pooled)
+    print(f"每请求节省 {old - new:.3f} ms ({(old - new) / old * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
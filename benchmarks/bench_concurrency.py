@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+同步 SDK 适配器在高并发下的吞吐和对其他线程池任务的影响
+
+用一个阻塞 --latency 秒的假 SDK 客户端替换 ZhiPuAdapter 的真实客户端，
+分别在 50/200/500 个并发请求下对比：
+  - shared:    在事件循环的默认线程池中执行（旧行为）
+  - dedicated: 在智谱专用线程池中执行（--workers 个线程）
+
+同时每隔 20 ms 向默认线程池提交一个空任务，记录它的排队延迟。
+这个延迟反映慢 LLM 调用对拼音预加载等其他后台任务的挤占。
+
+用法：python benchmarks/bench_concurrency.py [--latency 0.2] [--workers 64] [--levels 50 200 500]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 基准测试只关心线程池，放开限流
+os.environ.update(
+    ZHIPUAI_API_KEY=os.getenv("ZHIPUAI_API_KEY", "bench.benchmark"),
+    ZHIPUAI_RATE_LIMIT_RPS="1000000",
+    ZHIPUAI_RATE_LIMIT_BURST="1000000",
+    ZHIPUAI_MAX_IN_FLIGHT="100000",
+    ZHIPUAI_MAX_QUEUE="100000",
+    ZHIPUAI_MAX_QUEUE_WAIT="600",
+)
+
+from llm_adapter import ZhiPuAdapter
+from provider_executor import ProviderExecutor
+
+
+class BlockingCompletions:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def create(self, **kwargs):
+        time.sleep(self.latency)
+        message = SimpleNamespace(content="用最快的速度完成错误的事情。")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+async def probe_default_pool(stop, delays):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = time.perf_counter()
+        await loop.run_in_executor(None, lambda: None)
+        delays.append(time.perf_counter() - start)
+        await asyncio.sleep(0.02)
+
+
+async def run_level(adapter, concurrency):
+    stop = asyncio.Event()
+    delays = []
+    probe = asyncio.create_task(probe_default_pool(stop, delays))
+    start = time.perf_counter()
+    await asyncio.gather(*(adapter.generate_interpretation(f"词{i}") for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+    ms = sorted(d * 1000 for d in delays)
+    return concurrency / elapsed, statistics.median(ms), ms[-1]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="假 SDK 单次调用阻塞时间（秒）")
+    parser.add_argument("--workers", type=int, default=64, help="专用线程池线程数")
+    parser.add_argument("--levels", type=int, nargs="+", default=[50, 200, 500])
+    args = parser.parse_args()
+
+    adapter = ZhiPuAdapter()
+    adapter.client = SimpleNamespace(chat=SimpleNamespace(completions=BlockingCompletions(args.latency)))
+    dedicated = ProviderExecutor("zhipuai", args.workers)
+
+    print(f"假 SDK 延迟 {args.latency * 1000:.0f} ms，默认线程池 {min(32, (os.cpu_count() or 1) + 4)} 线程，"
+          f"专用线程池 {args.workers} 线程")
+    print(f"{'并发':>6} {'模式':<10} {'吞吐 (req/s)':>14} {'默认池排队 p50':>16} {'最大':>10}")
+    for level in args.levels:
+        for mode, executor in (("shared", None), ("dedicated", dedicated)):
+            adapter.executor = executor
+            throughput, p50, worst = await run_level(adapter, level)
+            print(f"{level:>6} {mode:<10} {throughput:>14.1f} {p50:>13.2f} ms {worst:>7.2f} ms")
+    dedicated.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
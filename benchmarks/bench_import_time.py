@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+冷启动导入耗时检查
+
+在全新子进程中用 python -X importtime 导入 app（或 --module 指定的模块），
+多次运行取中位数，列出最耗时的模块。以下情况以非零状态退出，可直接用于 CI
+（tests/test_import_time.py 会以默认参数运行本脚本）：
+  - 总耗时超过 --max-ms（默认 IMPORT_TIME_BUDGET_MS 或 1500 ms）
+  - 比 --baseline 记录的基线（默认 benchmarks/import_baseline.json）慢超过 --max-regression
+  - 导入了 --forbid 列出的模块（默认为各提供商 SDK、aiohttp 和 Pillow，它们应在首次使用时才导入）
+
+用法：
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --max-ms 800
+    python benchmarks/bench_import_time.py --save-baseline benchmarks/import_baseline.json
+    python benchmarks/bench_import_time.py --baseline benchmarks/import_baseline.json --max-regression 0.2
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "import_baseline.json")
+# 启动时不应导入的重量级模块
+DEFAULT_FORBIDDEN = ["openai", "zhipuai", "google.generativeai", "aiohttp", "httpx", "PIL", "cairosvg"]
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def run_importtime(module):
+    """返回 (总耗时微秒, {模块: 累计耗时微秒})"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-W", "ignore", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"导入 {module} 失败：\n{result.stderr}")
+
+    total = 0
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        _, cum, indent, name = match.groups()
+        cumulative[name] = int(cum)
+        # 只累加顶层导入，嵌套导入已包含在父模块的累计耗时中
+        if not indent:
+            total += int(cum)
+    return total, cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", 1500)),
+                        help="总导入耗时上限（毫秒），0 表示不检查")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE if os.path.exists(DEFAULT_BASELINE) else None,
+                        help="基线 JSON 文件，默认使用 benchmarks/import_baseline.json")
+    parser.add_argument("--no-baseline", action="store_true", help="不与基线比较")
+    parser.add_argument("--max-regression", type=float, default=float(os.getenv("IMPORT_TIME_MAX_REGRESSION", 0.5)),
+                        help="相对基线允许变慢的比例，默认 0.5（不同机器之间有波动）")
+    parser.add_argument("--forbid", nargs="*", default=DEFAULT_FORBIDDEN, help="启动时不允许导入的模块")
+    parser.add_argument("--save-baseline", help="把本次结果写入基线 JSON 文件")
+    args = parser.parse_args()
+
+    runs = [run_importtime(args.module) for _ in range(args.runs)]
+    total_ms = statistics.median(total for total, _ in runs) / 1000
+    modules = {}
+    for _, cumulative in runs:
+        for name, cum in cumulative.items():
+            modules.setdefault(name, []).append(cum)
+
+    print(f"import {args.module}: {total_ms:.1f} ms（{args.runs} 次中位数）")
+    heaviest = sorted(modules.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for name, samples in heaviest[:args.top]:
+        print(f"  {statistics.median(samples) / 1000:8.1f} ms  {name}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"module": args.module, "total_ms": round(total_ms, 1)}, f, indent=2)
+            f.write("\n")
+        print(f"基线已写入 {args.save_baseline}")
+
+    failed = False
+    imported = [name for name in args.forbid
+                if any(module == name or module.startswith(name + ".") for module in modules)]
+    if imported:
+        print(f"失败：导入 {args.module} 时加载了应当延迟导入的模块：{', '.join(imported)}")
+        failed = True
+    if args.max_ms and total_ms > args.max_ms:
+        print(f"失败：导入耗时 {total_ms:.1f} ms 超过上限 {args.max_ms:.1f} ms")
+        failed = True
+    if args.baseline and not args.no_baseline and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        baseline_ms = baseline["total_ms"]
+        limit = baseline_ms * (1 + args.max_regression)
+        if baseline.get("module", args.module) == args.module and total_ms > limit:
+            print(f"失败：导入耗时 {total_ms:.1f} ms 比基线 {baseline_ms:.1f} ms 慢超过 {args.max_regression:.0%}")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测量本地词库的构建耗时、单词查询和前缀查询的单次耗时
+
+在临时目录中生成 --entries 个合成词条并构建词库，然后分别测量：
+  - 单词查询：绕过 LRU 直接查 SQLite（冷查询）和经过 LRU 的热查询
+  - 前缀查询：一个字和两个字的前缀
+
+用法：python benchmarks/bench_lexicon.py [--entries 300000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lexicon
+
+# 常用汉字区间内随机组词，前缀分布接近真实词库
+_CHARS = [chr(cp) for cp in range(0x4E00, 0x4E00 + 3000)]
+
+
+def synthetic_words(count, seed=0):
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choice(_CHARS) for _ in range(rng.choice((2, 2, 3, 4)))))
+    return sorted(words, key=lambda _: rng.random())
+
+
+def per_call(fn, args, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for arg in args:
+            fn(arg)
+    return (time.perf_counter() - start) / (repeat * len(args))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=300000)
+    parser.add_argument("--queries", type=int, default=20000)
+    args = parser.parse_args()
+
+    words = synthetic_words(args.entries)
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "words.jsonl")
+        with open(source, "w", encoding="utf-8") as f:
+            for i, word in enumerate(words):
+                entry = {"word": word, "pinyin": "pin yin", "en": f"word {i}", "ja": word, "freq": i % 1000}
+                if i % 10 == 0:
+                    entry["interpretation"] = "用最快的速度完成错误的事情。"
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+        path = os.path.join(tmp, "lexicon.sqlite3")
+        start = time.perf_counter()
+        count = lexicon.build([source], path)
+        build_seconds = time.perf_counter() - start
+        size_mb = os.path.getsize(path) / 1024 / 1024
+
+        store = lexicon.Lexicon.open(path)
+        rng = random.Random(1)
+        hits = rng.sample(words, min(args.queries, len(words)))
+        misses = [f"{word}无" for word in hits]
+        hot = hits[:1000]
+
+        cold = per_call(store._lookup, hits)
+        miss = per_call(store._lookup, misses)
+        per_call(store.lookup, hot)
+        cached = per_call(store.lookup, hot, repeat=20)
+        one_char = per_call(store.suggest, [word[0] for word in hits[:2000]])
+        two_chars = per_call(store.suggest, [word[:2] for word in hits[:2000]])
+        store.close()
+
+    print(f"构建 {count} 个词条：{build_seconds:.1f} 秒，文件 {size_mb:.1f} MB")
+    print(f"  单词查询（SQLite，命中）  {cold * 1e6:8.2f} µs")
+    print(f"  单词查询（SQLite，未命中）{miss * 1e6:8.2f} µs")
+    print(f"  单词查询（LRU）           {cached * 1e6:8.2f} µs")
+    print(f"  前缀查询（一个字）        {one_char * 1e6:8.2f} µs")
+    print(f"  前缀查询（两个字）        {two_chars * 1e6:8.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测量拼音词典的加载开销和拼音/翻译查询的单次耗时
+
+- 启动：在全新子进程中分别测量导入 chinese_word_reinterpreter 的耗时（拼音词典延迟加载）
+  和单独导入 pypinyin 的耗时（原先在模块导入时同步支付的部分）
+- 单次调用：同一批词语分别走未缓存的 pypinyin 分词和记忆化后的 get_pinyin
+
+用法：python benchmarks/bench_pinyin.py [--rounds 20]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORDS = ["委婉", "效率", "会议", "加班", "团建", "出人头地", "内卷", "躺平", "打工人", "摸鱼", "画饼", "格局"]
+
+_TIMED_IMPORT = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def import_time(module, rounds):
+    samples = []
+    for _ in range(rounds):
+        out = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", _TIMED_IMPORT.format(module=module)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        samples.append(float(out.strip().splitlines()[-1]))
+    return sorted(samples)[len(samples) // 2]
+
+
+def per_call(fn, words, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for word in words:
+            fn(word)
+    return (time.perf_counter() - start) / (repeat * len(words))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5, help="子进程导入测量次数，取中位数")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    print("启动（中位数）：")
+    print(f"  import pypinyin                    {import_time('pypinyin', args.rounds) * 1000:8.1f} ms")
+    print(f"  import chinese_word_reinterpreter  {import_time('chinese_word_reinterpreter', args.rounds) * 1000:8.1f} ms")
+
+    from chinese_word_reinterpreter import ChineseWordReinterpreter, get_pinyin, preload_pinyin
+
+    start = time.perf_counter()
+    preload_pinyin()
+    print(f"  preload_pinyin()                   {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    interpreter = ChineseWordReinterpreter()
+    uncached = per_call(get_pinyin.__wrapped__, WORDS, args.repeat)
+    cached = per_call(interpreter._get_pinyin, WORDS, args.repeat)
+    fallback = per_call(interpreter._generate_critical_interpretation, WORDS, args.repeat)
+    print("单次调用：")
+    print(f"  pypinyin 分词（未缓存）             {uncached * 1e6:8.2f} µs")
+    print(f"  _get_pinyin（记忆化）               {cached * 1e6:8.2f} µs")
+    print(f"  _generate_critical_interpretation  {fallback * 1e6:8.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+对冲路由的排序检查
+
+两个假提供商：slow 每次耗时 --slow 秒，fast 每次耗时 --fast 秒，对冲延迟为 --hedge 秒。
+连续调用 --calls 次后，slow 应当因为对冲落败的延迟下界样本排到 fast 之后，
+平均耗时应接近 fast 而不是对冲延迟。排序不对或平均耗时超过 --max-avg 时以非零状态退出。
+
+用法：python benchmarks/bench_router_hedging.py [--calls 30] [--slow 0.5] [--fast 0.02] [--hedge 0.1]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from provider_router import ProviderRouter
+
+
+async def run(args):
+    latencies = {"slow": args.slow, "fast": args.fast}
+    router = ProviderRouter(default_hedge_delay=args.hedge, min_hedge_delay=args.hedge)
+
+    async def fn(name):
+        await asyncio.sleep(latencies[name])
+        return name
+
+    elapsed = []
+    for _ in range(args.calls):
+        start = time.perf_counter()
+        await router.call(["slow", "fast"], fn)
+        elapsed.append(time.perf_counter() - start)
+    return router, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=30)
+    parser.add_argument("--slow", type=float, default=0.5)
+    parser.add_argument("--fast", type=float, default=0.02)
+    parser.add_argument("--hedge", type=float, default=0.1)
+    parser.add_argument("--max-avg", type=float, default=0.05, help="平均耗时上限（秒）")
+    args = parser.parse_args()
+
+    router, elapsed = asyncio.run(run(args))
+    order = router.rank(["slow", "fast"])
+    average = sum(elapsed) / len(elapsed)
+    for name, stats in router.snapshot().items():
+        print(f"  {name:<5} ewma={stats['ewma_latency']}")
+    print(f"排序 {order}，平均耗时 {average * 1000:.1f} ms")
+
+    failures = []
+    if order[0] != "fast":
+        failures.append("slow 仍排在最前")
+    if average > args.max_avg:
+        failures.append(f"平均耗时超过 {args.max_avg * 1000:.0f} ms")
+    if failures:
+        sys.exit("检查失败：" + "；".join(failures))
+
+
+if __name__ == "__main__":
+    main()
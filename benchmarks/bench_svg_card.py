@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+对比预编译模板和 svgwrite 逐元素构建两种卡片渲染方式的吞吐量
+
+两种方式使用相同的词语、拼音和排版结果，只比较 SVG 构建和序列化本身；
+运行前会先校验两者输出逐字节一致。另外单独测量按字宽排版（不命中记忆化缓存）的吞吐量。
+
+用法：python benchmarks/bench_svg_card.py [--cards 5000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import svg_card
+import text_layout
+
+SAMPLES = [
+    ("委婉", "wěi wǎn", "刺向他人时, 决定在剑刃上撒上止痛药。"),
+    ("效率", "xiào lǜ", "用最快的速度完成错误的事情。"),
+    ("会议", "huì yì", "一群人坐在一起，互相浪费时间的艺术。"),
+    ("加班", "jiā bān", "用生命为资本家的游艇添砖加瓦。"),
+    ("团建", "tuán jiàn", "强制性的快乐，预算内的友谊。"),
+    ("出人头地", "chū rén tóu dì", "在一个人人低头的时代，有人选择抬起头来 —— 然后发现自己成了靶子。"),
+    ("内卷", "nèi juǎn", "所有人都在跑步机上冲刺，<终点>却被悄悄挪到了更远的地方 & 没人敢停。"),
+]
+
+
+def measure(render, cards):
+    inputs = []
+    for word, pinyin, text in SAMPLES:
+        font_size, lines = svg_card.layout_interpretation(text)
+        inputs.append((word, pinyin, lines, font_size))
+    start = time.perf_counter()
+    for i in range(cards):
+        render(*inputs[i % len(inputs)])
+    return cards / (time.perf_counter() - start)
+
+
+def measure_layout(count):
+    # 每条文字都不相同，并清空记忆化缓存，测量的是实际排版的开销
+    texts = [f"{SAMPLES[i % len(SAMPLES)][2]}{i}" for i in range(count)]
+    text_layout.layout_text.cache_clear()
+    text_layout.text_width("预热字宽表")
+    start = time.perf_counter()
+    for text in texts:
+        svg_card.layout_interpretation(text)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=5000)
+    args = parser.parse_args()
+
+    for word, pinyin, text in SAMPLES:
+        font_size, lines = svg_card.layout_interpretation(text)
+        if svg_card.render_card(word, pinyin, lines, font_size) != \
+                svg_card.render_card_svgwrite(word, pinyin, lines, font_size):
+            sys.exit(f"输出不一致：{word}")
+
+    measure(svg_card.render_card_svgwrite, 100)
+    legacy = measure(svg_card.render_card_svgwrite, args.cards)
+    template = measure(svg_card.render_card, args.cards)
+    print(f"svgwrite  {legacy:12,.0f} cards/s")
+    print(f"template  {template:12,.0f} cards/s")
+    print(f"加速 {template / legacy:.1f}x")
+    print(f"layout    {measure_layout(args.cards):12,.0f} layouts/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+对 Quart 服务做固定并发压测，LLM 由本地模拟服务代替
+
+依次启动 benchmarks/mock_llm_server.py 和 serve.py（生产模式）两个子进程，并把各提供商的
+地址指向模拟服务，解释缓存和卡片缓存放在临时目录中。然后在每个并发级别下持续压测 --duration 秒，输出以下结果：
+  - 吞吐（req/s）、p50/p95/p99 延迟、非 200 响应数
+  - 服务进程树的常驻内存（RSS）和峰值内存（HWM），读取 /proc，仅 Linux
+
+结果写入 JSON 文件（默认 benchmarks/results/<时间>.json）；--compare 可与之前的结果逐项对比。
+
+用法：
+    python benchmarks/load_test.py --levels 10 50 100 --duration 15 --model deepseek
+    python benchmarks/load_test.py --endpoint card --latency lognormal:-1.5,0.5 --error-rate 0.01
+    python benchmarks/load_test.py --compare benchmarks/results/20240101-120000.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import quote
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_tree(pid: int) -> list:
+    """pid 及其所有子孙进程（hypercorn 在子进程中运行应用）"""
+    pids = [pid]
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                for child in f.read().split():
+                    pids.extend(process_tree(int(child)))
+    except OSError:
+        pass
+    return pids
+
+
+def read_memory_kb(pid: int) -> dict:
+    """服务进程树的 VmRSS 和 VmHWM 之和（KB），非 Linux 平台返回空字典"""
+    totals = {}
+    for process in process_tree(pid):
+        try:
+            with open(f"/proc/{process}/status") as f:
+                fields = dict(line.split(":", 1) for line in f if ":" in line)
+        except OSError:
+            continue
+        for key, name in (("rss_kb", "VmRSS"), ("hwm_kb", "VmHWM")):
+            if name in fields:
+                totals[key] = totals.get(key, 0) + int(fields[name].split()[0])
+    return totals
+
+
+async def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                sys.exit(f"子进程提前退出：{' '.join(process.args)}")
+            try:
+                async with session.get(url) as response:
+                    await response.read()
+                    return
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.2)
+    sys.exit(f"等待 {url} 超时")
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_level(base_url: str, args, concurrency: int, counter) -> dict:
+    latencies = []
+    statuses = {}
+    stop_at = time.monotonic() + args.duration
+
+    async def worker(session):
+        while time.monotonic() < stop_at:
+            # 默认每个请求使用不同词语，避免全部命中解释缓存
+            n = next(counter)
+            word = f"压测{n % args.distinct_words}" if args.distinct_words else f"压测{n}"
+            start = time.perf_counter()
+            try:
+                if args.endpoint == "card":
+                    request = session.get(f"{base_url}/card/{args.model}/{quote(word)}.svg")
+                else:
+                    request = session.post(f"{base_url}/interpret", json={"word": word, "model": args.model})
+                async with request as response:
+                    await response.read()
+                    status = response.status
+            except aiohttp.ClientError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    ms = sorted(latency * 1000 for latency in latencies)
+    return {
+        "concurrency": concurrency,
+        "requests": len(ms),
+        "rps": round(len(ms) / elapsed, 2),
+        "p50_ms": round(percentile(ms, 0.50), 2) if ms else None,
+        "p95_ms": round(percentile(ms, 0.95), 2) if ms else None,
+        "p99_ms": round(percentile(ms, 0.99), 2) if ms else None,
+        "mean_ms": round(statistics.mean(ms), 2) if ms else None,
+        "non_200": sum(count for status, count in statuses.items() if status != "200"),
+        "statuses": statuses,
+    }
+
+
+def print_results(results, baseline=None):
+    base = {row["concurrency"]: row for row in (baseline or {}).get("levels", [])}
+    print(f"{'并发':>6} {'请求数':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'非200':>6} {'RSS MB':>8}")
+    for row in results["levels"]:
+        rss = row.get("memory", {}).get("rss_kb")
+        print(f"{row['concurrency']:>6} {row['requests']:>8} {row['rps']:>9.1f} {row['p50_ms']:>9.1f} "
+              f"{row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['non_200']:>6} "
+              f"{rss / 1024 if rss else 0:>8.1f}")
+        old = base.get(row["concurrency"])
+        if old:
+            deltas = []
+            for key in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+                if old.get(key):
+                    deltas.append(f"{key} {(row[key] - old[key]) / old[key]:+.1%}")
+            print(f"{'':>6} 对比基线：{'，'.join(deltas)}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, nargs="+", default=[10, 50, 100], help="并发级别")
+    parser.add_argument("--duration", type=float, default=10.0, help="每个并发级别的压测时长（秒）")
+    parser.add_argument("--model", default="deepseek", choices=["deepseek", "qwen", "openai", "zhipuai", "auto"])
+    parser.add_argument("--endpoint", default="interpret", choices=["interpret", "card"])
+    parser.add_argument("--distinct-words", type=int, default=0,
+                        help="循环使用的不同词语数，0 表示每个请求都用新词语（不命中缓存）")
+    parser.add_argument("--request-timeout", type=float, default=60.0)
+    parser.add_argument("--latency", default="lognormal:-1.6,0.4", help="模拟服务的延迟分布")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=1, help="服务工作进程数（serve.py --workers）")
+    parser.add_argument("--output", help="结果 JSON 路径，默认 benchmarks/results/<时间>.json")
+    parser.add_argument("--compare", help="与之前保存的结果 JSON 对比")
+    args = parser.parse_args()
+
+    mock_port, app_port = free_port(), free_port()
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="mock", OPENAI_BASE_URL=f"{mock_url}/v1",
+        DEEPSEEK_API_KEY="mock", DEEPSEEK_BASE_URL=f"{mock_url}/v1",
+        ZHIPUAI_API_KEY="mock.mock", ZHIPUAI_BASE_URL=f"{mock_url}/v1",
+        QWEN_API_KEY="mock", QWEN_BASE_URL=f"{mock_url}/api/v1",
+        ROUTER_PROVIDERS="deepseek,qwen,openai",
+        LOG_LEVEL="WARNING",
+    )
+    # 共享缓存和词库放在临时目录，多工作进程时与生产模式一样通过 SQLite WAL 共享；
+    # 不读写工作目录下 .cache 中已有的数据，每次压测都从冷缓存开始，也不会污染开发环境。
+    # 临时目录中没有词库文件，只使用内置词条
+    cache_dir = tempfile.mkdtemp(prefix="wordnew-load-")
+    env.setdefault("INTERPRETATION_CACHE_PATH", os.path.join(cache_dir, "interpretations.sqlite3"))
+    env.setdefault("CARD_CACHE_PATH", os.path.join(cache_dir, "cards.sqlite3"))
+    env.setdefault("RASTER_CACHE_PATH", os.path.join(cache_dir, "rasters.sqlite3"))
+    env.setdefault("LEXICON_PATH", os.path.join(cache_dir, "lexicon.sqlite3"))
+    # 压测关注服务本身的吞吐，默认放开限流；需要测试限流时可在环境变量中显式设置
+    for key, value in (("LLM_RATE_LIMIT_RPS", "100000"), ("LLM_RATE_LIMIT_BURST", "100000"),
+                       ("LLM_MAX_IN_FLIGHT", "10000"), ("LLM_MAX_QUEUE", "10000")):
+        env.setdefault(key, value)
+    # 启动时预先构建适配器，避免首批请求把 SDK 导入耗时计入延迟
+    env.setdefault("LLM_PRELOAD_ADAPTERS", ",".join(["deepseek", "qwen", "openai", "auto"]
+                                                    if args.model == "auto" else [args.model]))
+
+    mock = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "benchmarks", "mock_llm_server.py"), "--port", str(mock_port),
+         "--latency", args.latency, "--error-rate", str(args.error_rate),
+         "--rate-limit-rate", str(args.rate_limit_rate)],
+        cwd=ROOT,
+    )
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--bind", f"127.0.0.1:{app_port}", "--workers", str(args.workers)],
+        cwd=ROOT, env=env,
+    )
+    base_url = f"http://127.0.0.1:{app_port}"
+    counter = iter(range(10 ** 12))
+    results = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "levels": [],
+    }
+    try:
+        await wait_until_ready(f"{mock_url}/stats", mock)
+        await wait_until_ready(f"{base_url}/metrics", server)
+        for level in args.levels:
+            row = await run_level(base_url, args, level, counter)
+            row["memory"] = read_memory_kb(server.pid)
+            results["levels"].append(row)
+            print(f"并发 {level}：{row['rps']:.1f} req/s，p99 {row['p99_ms']} ms", flush=True)
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{mock_url}/stats") as response:
+                results["mock_stats"] = await response.json()
+    finally:
+        for process in (server, mock):
+            process.terminate()
+        for process in (server, mock):
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print()
+    print_results(results, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    print(f"结果已写入 {output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地模拟 LLM 服务，用于压测和基准测试，不消耗真实 token
+
+支持的接口格式：
+  - POST .../chat/completions：OpenAI 兼容格式（OpenAI、DeepSeek、智谱 v4），支持 "stream": true
+  - POST .../services/aigc/text-generation/generation：DashScope（通义千问），
+    支持 X-DashScope-SSE: enable 和 incremental_output
+  - GET /stats：各状态码的请求计数
+
+把各提供商的地址指向它：
+    OPENAI_BASE_URL=http://127.0.0.1:8800/v1
+    DEEPSEEK_BASE_URL=http://127.0.0.1:8800/v1
+    ZHIPUAI_BASE_URL=http://127.0.0.1:8800/v1
+    QWEN_BASE_URL=http://127.0.0.1:8800/api/v1
+
+延迟分布（--latency）：fixed:0.2、uniform:0.1,0.5、lognormal:-1.5,0.5（ln 秒的均值和标准差）、exp:0.3
+批量提示词（含 “词语：[...]”）会返回 JSON 对象，便于测试多词打包。
+
+用法：python benchmarks/mock_llm_server.py --port 8800 --latency lognormal:-1.5,0.5 --error-rate 0.01 --rate-limit-rate 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from collections import Counter
+from typing import Callable, List
+
+from aiohttp import web
+
+REPLY = "在效率的名义下，用最快的速度完成错误的事情。"
+_BATCH_WORDS = re.compile(r"词语：(\[.*\])", re.S)
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """把延迟分布描述解析为采样函数（秒）"""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(values[0], values[1])
+    if kind == "exp":
+        return lambda: random.expovariate(1 / values[0])
+    raise argparse.ArgumentTypeError(f"未知的延迟分布：{spec}")
+
+
+def reply_for(prompt: str) -> str:
+    match = _BATCH_WORDS.search(prompt)
+    if match:
+        try:
+            words = json.loads(match.group(1))
+            return json.dumps({word: f"{word}：{REPLY}" for word in words}, ensure_ascii=False)
+        except json.JSONDecodeError:
+            pass
+    return REPLY
+
+
+def split_chunks(text: str, count: int) -> List[str]:
+    size = max(1, -(-len(text) // count))
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class MockProvider:
+    def __init__(self, latency: Callable[[], float], error_rate: float, rate_limit_rate: float,
+                 retry_after: float, stream_chunks: int, chunk_delay: float):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.stream_chunks = stream_chunks
+        self.chunk_delay = chunk_delay
+        self.counts = Counter()
+
+    async def _fault(self):
+        """按配置的比例返回 429 或 500，否则返回 None"""
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            self.counts[429] += 1
+            return web.json_response({"error": {"message": "rate limited"}, "error_msg": "rate limited"},
+                                     status=429, headers={"Retry-After": str(self.retry_after)})
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.counts[500] += 1
+            return web.json_response({"error": {"message": "internal error"}, "error_msg": "internal error"},
+                                     status=500)
+        return None
+
+    async def _stream(self, request, events):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        for event in events:
+            await response.write(f"data: {event}\n\n".encode("utf-8"))
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+        await response.write_eof()
+        self.counts[200] += 1
+        return response
+
+    async def chat_completions(self, request):
+        body = await request.json()
+        await asyncio.sleep(self.latency())
+        fault = await self._fault()
+        if fault is not None:
+            return fault
+        text = reply_for(body["messages"][-1]["content"])
+        model = body.get("model", "mock")
+        created = int(time.time())
+        if body.get("stream"):
+            events = [json.dumps({"id": "mock", "object": "chat.completion.chunk", "created": created, "model": model,
+                                  "choices": [{"index": 0, "delta": {"role": "assistant", "content": chunk},
+                                               "finish_reason": None}]}, ensure_ascii=False)
+                      for chunk in split_chunks(text, self.stream_chunks)]
+            return await self._stream(request, events + ["[DONE]"])
+        self.counts[200] += 1
+        return web.json_response({
+            "id": "mock", "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    async def dashscope_generation(self, request):
+        body = await request.json()
+        await asyncio.sleep(self.latency())
+        fault = await self._fault()
+        if fault is not None:
+            return fault
+        text = reply_for(body["input"]["messages"][-1]["content"])
+
+        def event(content):
+            return json.dumps({"output": {"choices": [{"message": {"role": "assistant", "content": content},
+                                                       "finish_reason": "null"}]},
+                               "request_id": "mock"}, ensure_ascii=False)
+
+        if request.headers.get("X-DashScope-SSE") == "enable":
+            chunks = split_chunks(text, self.stream_chunks)
+            if not body.get("parameters", {}).get("incremental_output"):
+                chunks = ["".join(chunks[:i + 1]) for i in range(len(chunks))]
+            return await self._stream(request, [event(chunk) for chunk in chunks])
+        self.counts[200] += 1
+        return web.Response(text=event(text), content_type="application/json")
+
+    async def stats(self, request):
+        return web.json_response({str(status): count for status, count in sorted(self.counts.items())})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/{prefix:.*}/chat/completions", self.chat_completions)
+        app.router.add_post("/{prefix:.*}/services/aigc/text-generation/generation", self.dashscope_generation)
+        app.router.add_get("/stats", self.stats)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency", type=parse_latency, default=parse_latency("fixed:0.2"), help="响应延迟分布")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 HTTP 500 的比例")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回 HTTP 429 的比例")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 响应的 Retry-After（秒）")
+    parser.add_argument("--stream-chunks", type=int, default=5, help="流式响应拆分的分片数")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="流式分片之间的间隔（秒）")
+    args = parser.parse_args()
+
+    provider = MockProvider(args.latency, args.error_rate, args.rate_limit_rate, args.retry_after,
+                            args.stream_chunks, args.chunk_delay)
+    web.run_app(provider.app(), host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
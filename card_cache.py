@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+GET /card 接口的响应缓存
+
+缓存的是已经编码好的响应体：原始 SVG 和按需生成的 gzip/brotli 压缩结果。
+重复访问同一张卡片时直接返回缓存的字节，不需要再渲染或压缩。ETag 取 SVG 内容的
+SHA-256，所以同一张卡片的各种编码共用一个 ETag 前缀。brotli 是可选依赖，
+没有安装时只提供 gzip。
+
+进程内 LRU 之下还有一层 SQLite（WAL 模式）持久层，多个工作进程共享同一个文件：
+一个进程生成的卡片，其他进程直接读取 SVG，只需在本进程内按需压缩。
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import shared_db
+import svg_card
+from llm_adapter import PROMPT_VERSION
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_CARD_CACHE_PATH = ".cache/cards.sqlite3"
+DEFAULT_CARD_TTL = 7 * 24 * 3600
+DEFAULT_CARD_DISK_SIZE = 100_000
+
+
+def _compress(encoding: str, data: bytes) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    # mtime 固定为 0，保证相同内容压缩出相同的字节
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """解析 Accept-Encoding，返回 {编码: q 值}"""
+    accepted = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+class EncodedCard:
+    """一张卡片的原始 SVG、ETag 和各种压缩编码"""
+
+    def __init__(self, svg: str):
+        self.identity = svg.encode("utf-8")
+        self.digest = hashlib.sha256(self.identity).hexdigest()[:32]
+        self._encoded: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def etag(self, encoding: str = "identity") -> str:
+        # 不同编码的响应体不同，强 ETag 需要区分；比较时只看哈希部分
+        if encoding == "identity":
+            return f'"{self.digest}"'
+        return f'"{self.digest}-{encoding}"'
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """If-None-Match 中是否包含本卡片（忽略 W/ 前缀和编码后缀）"""
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*":
+                return True
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag.strip('"').split("-", 1)[0] == self.digest:
+                return True
+        return False
+
+    def negotiate(self, accept_encoding: Optional[str]) -> str:
+        """按客户端支持选择编码：优先 brotli，其次 gzip"""
+        accepted = parse_accept_encoding(accept_encoding)
+        wildcard = accepted.get("*", 0)
+        if brotli is not None and accepted.get("br", wildcard) > 0:
+            return "br"
+        if accepted.get("gzip", wildcard) > 0:
+            return "gzip"
+        return "identity"
+
+    def body(self, encoding: str) -> bytes:
+        if encoding == "identity":
+            return self.identity
+        data = self._encoded.get(encoding)
+        if data is None:
+            with self._lock:
+                data = self._encoded.get(encoding)
+                if data is None:
+                    data = self._encoded[encoding] = _compress(encoding, self.identity)
+        return data
+
+    def size(self) -> int:
+        return len(self.identity) + sum(len(data) for data in self._encoded.values())
+
+
+class CardResponseCache:
+    """
+    按 (模型, 词语) 缓存 EncodedCard：进程内 LRU 同时限制条目数和总字节数，
+    可选的 SQLite 持久层在工作进程之间共享
+    """
+
+    def __init__(self, max_items: int = 2048, max_bytes: int = 64 * 1024 * 1024, path: Optional[str] = None,
+                 ttl: float = DEFAULT_CARD_TTL, max_disk_items: int = DEFAULT_CARD_DISK_SIZE,
+                 version: str = f"{PROMPT_VERSION}.{svg_card.TEMPLATE_VERSION}"):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_disk_items = max_disk_items
+        self.version = version
+        self._items: "OrderedDict[str, EncodedCard]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._disk: Optional[shared_db.SharedTable] = None
+        if path:
+            self._disk = shared_db.SharedTable.open(path, "cards", "svg", ttl=ttl, max_items=max_disk_items,
+                                                    label="卡片缓存")
+
+    @classmethod
+    def from_env(cls) -> "CardResponseCache":
+        """CARD_CACHE_PATH 为空时只使用进程内缓存"""
+        return cls(
+            max_items=int(os.getenv("CARD_CACHE_ITEMS", 2048)),
+            max_bytes=int(os.getenv("CARD_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+            path=os.getenv("CARD_CACHE_PATH", DEFAULT_CARD_CACHE_PATH),
+            ttl=float(os.getenv("CARD_CACHE_TTL", DEFAULT_CARD_TTL)),
+            max_disk_items=int(os.getenv("CARD_CACHE_DISK_SIZE", DEFAULT_CARD_DISK_SIZE)),
+        )
+
+    def make_key(self, adapter_name: str, word: str) -> str:
+        return f"{self.version}\x1f{adapter_name}\x1f{word}"
+
+    def get(self, key: str) -> Optional[EncodedCard]:
+        with self._lock:
+            card = self._items.get(key)
+            if card is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return card
+
+            if self._disk is not None:
+                row = self._disk.get(key)
+                if row is not None:
+                    card = EncodedCard(bytes(row[0]).decode("utf-8"))
+                    self._remember(key, card)
+                    self.disk_hits += 1
+                    return card
+            self.misses += 1
+            return None
+
+    def set(self, key: str, card: EncodedCard) -> None:
+        with self._lock:
+            self._remember(key, card)
+            if self._disk is not None:
+                self._disk.set(key, card.identity)
+
+    def _remember(self, key: str, card: EncodedCard) -> None:
+        self._items[key] = card
+        self._items.move_to_end(key)
+        self._evict()
+
+    def _evict(self) -> None:
+        # 压缩结果是按需加入的，这里按当前大小估算总字节数
+        total = sum(card.size() for card in self._items.values())
+        while self._items and (len(self._items) > self.max_items or total > self.max_bytes):
+            _, card = self._items.popitem(last=False)
+            total -= card.size()
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "evictions": self.evictions, "items": len(self._items)}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
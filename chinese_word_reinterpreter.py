@@ -1,14 +1,51 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import svgwrite
+import os
+import logging
+import svg_card
 from dataclasses import dataclass
-from typing import List, Tuple, Optional
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Tuple, Optional
 import random
 from pathlib import Path
 import asyncio
-from pypinyin import pinyin, Style as PinyinStyle
-from llm_adapter import LLMAdapter
+from llm_adapter import LLMAdapter, LLMError
+from rate_limit import RateLimitExceeded
+from interpretation_cache import InterpretationCache
+from lexicon import Lexicon, get_lexicon
+from metrics import FALLBACKS, LEXICON_HITS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# 拼音和翻译的记忆化条目上限
+LOOKUP_CACHE_SIZE = int(os.getenv('LOOKUP_CACHE_SIZE', 4096))
+
+def preload_pinyin() -> None:
+    """
+    加载 pypinyin 及其词组词典
+
+    pypinyin 导入时会加载较大的词典，这里推迟到第一次取拼音时再导入；
+    服务启动时可以在后台线程中调用本函数提前加载。
+    """
+    import pypinyin  # noqa: F401
+
+@lru_cache(maxsize=LOOKUP_CACHE_SIZE)
+def get_pinyin(word: str) -> str:
+    """获取拼音"""
+    try:
+        from pypinyin import pinyin, Style as PinyinStyle
+        py_list = pinyin(word, style=PinyinStyle.TONE)
+        return ' '.join([p[0] for p in py_list])
+    except:
+        return word
+
+def translate_word(word: str, lexicon: Optional[Lexicon] = None) -> Tuple[str, str]:
+    """翻译词语到英文和日文，词库中没有的词语原样返回"""
+    entry = (lexicon if lexicon is not None else get_lexicon()).lookup(word)
+    if entry is None:
+        return word, word
+    return entry.en or word, entry.ja or word
 
 @dataclass
 class Style:
@@ -17,158 +54,141 @@ class Style:
     accent_color: str
     
 class ChineseWordReinterpreter:
-    def __init__(self):
+    def __init__(self, cache: Optional[InterpretationCache] = None, lexicon: Optional[Lexicon] = None):
+        self.cache = cache
+        self.lexicon = lexicon if lexicon is not None else get_lexicon()
         self.styles = ["Oscar Wilde", "Lu Xun", "Luo Yonghua"]
-        self.pinyin_converter = pinyin
-            
-        # 常用词翻译字典
-        self.translations = {
-            "出人头地": {
-                "en": "stand out from the crowd",
-                "ja": "頭角を現す"
-            },
-            "委婉": {
-                "en": "tactful",
-                "ja": "婉曲"
-            },
-            "效率": {
-                "en": "efficiency",
-                "ja": "効率"
-            },
-            "会议": {
-                "en": "meeting",
-                "ja": "会議"
-            },
-            "加班": {
-                "en": "overtime",
-                "ja": "残業"
-            },
-            "团建": {
-                "en": "team building",
-                "ja": "チームビルディング"
-            }
-        }
             
     def _get_pinyin(self, word: str) -> str:
-        """获取拼音"""
-        try:
-            py_list = self.pinyin_converter(word, style=PinyinStyle.TONE)
-            return ' '.join([p[0] for p in py_list])
-        except:
-            return word
+        """获取拼音，优先使用词库中的拼音"""
+        entry = self.lexicon.lookup(word)
+        if entry is not None and entry.pinyin:
+            return entry.pinyin
+        return get_pinyin(word)
         
     def _translate_word(self, word: str) -> Tuple[str, str]:
         """翻译词语到英文和日文"""
-        if word in self.translations:
-            return self.translations[word]["en"], self.translations[word]["ja"]
-        return word, word
+        return translate_word(word, self.lexicon)
+
+    def curated_interpretation(self, word: str) -> Optional[str]:
+        """词库中的预置解释"""
+        return self.lexicon.interpretation(word)
         
     async def interpret_word(self, word: str, llm_adapter: Optional[LLMAdapter] = None) -> str:
         """使用LLM生成解释"""
+        # 词库中有预置解释的词语不调用 LLM
+        curated = self.curated_interpretation(word)
+        if curated is not None:
+            LEXICON_HITS.inc(provider=llm_adapter.name if llm_adapter else "none")
+            return curated
         if llm_adapter:
+            if self.cache is not None:
+                cached = self.cache.get(word, llm_adapter.name)
+                if cached is not None:
+                    return cached
             try:
+                # 适配器失败时抛出异常，走到这里的都是 LLM 成功生成的解释；兜底文本不缓存
                 interpretation = await llm_adapter.generate_interpretation(word)
-                if interpretation and not interpretation.startswith("抱歉"):
-                    return interpretation
+                if self.cache is not None:
+                    self.cache.set(word, llm_adapter.name, interpretation)
+                return interpretation
+            except RateLimitExceeded:
+                # 本地限流拒绝不降级为兜底解释，交给接口层返回 503
+                raise
             except Exception as e:
-                print(f"Error generating interpretation: {e}")
+                logger.warning("生成解释失败，使用默认解释", extra={"word": word, "provider": llm_adapter.name, "error": str(e)})
         
         # 如果没有LLM或LLM失败，使用默认生成方法
+        FALLBACKS.inc(provider=llm_adapter.name if llm_adapter else "none")
         return self._generate_critical_interpretation(word)
         
+    async def interpret_words(self, words: List[str], llm_adapter: LLMAdapter) -> Tuple[Dict[str, str], List[str]]:
+        """
+        批量生成解释：先查缓存，未命中的词语交给适配器打包生成，失败的词语使用默认解释
+
+        返回 ({词语: 解释}, 使用了默认解释的词语)，调用方据此决定是否稍后重试这些词语。
+        """
+        results = {}
+        fallbacks = []
+        missing = []
+        for word in dict.fromkeys(words):
+            curated = self.curated_interpretation(word)
+            if curated is not None:
+                LEXICON_HITS.inc(provider=llm_adapter.name)
+                results[word] = curated
+                continue
+            cached = self.cache.get(word, llm_adapter.name) if self.cache is not None else None
+            if cached is not None:
+                results[word] = cached
+            else:
+                missing.append(word)
+        if not missing:
+            return results, fallbacks
+
+        generated = await llm_adapter.generate_interpretations(missing)
+        for word in missing:
+            interpretation = generated.get(word)
+            if interpretation:
+                if self.cache is not None:
+                    self.cache.set(word, llm_adapter.name, interpretation)
+                results[word] = interpretation
+            else:
+                FALLBACKS.inc(provider=llm_adapter.name)
+                results[word] = self._generate_critical_interpretation(word)
+                fallbacks.append(word)
+        return results, fallbacks
+
+    async def stream_interpretation(self, word: str, llm_adapter: LLMAdapter) -> AsyncIterator[str]:
+        """
+        流式生成解释，逐段产出文本
+
+        词库预置解释或缓存命中时一次性产出；LLM 失败时抛出异常，由调用方决定如何兜底。
+        """
+        curated = self.curated_interpretation(word)
+        if curated is not None:
+            LEXICON_HITS.inc(provider=llm_adapter.name)
+            yield curated
+            return
+        if self.cache is not None:
+            cached = self.cache.get(word, llm_adapter.name)
+            if cached is not None:
+                yield cached
+                return
+        
+        parts = []
+        async for delta in llm_adapter.stream_interpretation(word):
+            parts.append(delta)
+            yield delta
+        
+        interpretation = ''.join(parts)
+        if not interpretation.strip():
+            raise LLMError("空响应")
+        if self.cache is not None:
+            self.cache.set(word, llm_adapter.name, interpretation)
+        
     def _generate_critical_interpretation(self, word: str) -> str:
         """Generate a witty and critical interpretation"""
-        interpretations = {
-            "委婉": "刺向他人时, 决定在剑刃上撒上止痛药。",
-            "效率": "用最快的速度完成错误的事情。",
-            "会议": "一群人坐在一起，互相浪费时间的艺术。",
-            "加班": "用生命为资本家的游艇添砖加瓦。",
-            "团建": "强制性的快乐，预算内的友谊。",
-            "出人头地": "在一个人人低头的时代，有人选择抬起头来 —— 然后发现自己成了靶子。"
-        }
-        
-        if word in interpretations:
-            return interpretations[word]
+        curated = self.curated_interpretation(word)
+        if curated is not None:
+            return curated
             
         # Generate a new interpretation based on word characteristics
         return f"在这个荒诞的世界里，'{word}'不过是一个美丽的谎言，" \
                f"我们都在用它来粉饰太平，掩盖真相。"
 
-    def _wrap_text(self, text: str, max_chars_per_line: int) -> List[str]:
-        """
-        将文本按照最大字符数换行，确保不会超出SVG范围
-        """
-        # 移除多余的空格
-        text = ' '.join(text.split())
-        
-        # 标点符号列表（在这些符号后优先换行）
-        punctuations = '。，；！？、'
-        
-        lines = []
-        current_line = ''
-        
-        for char in text:
-            current_line += char
-            
-            # 如果当前行达到最大长度或遇到标点符号
-            if len(current_line) >= max_chars_per_line or char in punctuations:
-                lines.append(current_line)
-                current_line = ''
-        
-        # 添加最后一行（如果有）
-        if current_line:
-            lines.append(current_line)
-        
-        return lines
-
     def _create_svg_card(self, word: str, interpretation: str) -> str:
-        # 创建SVG画布，固定尺寸 200x240
-        width = 200
-        height = 240
-        dwg = svgwrite.Drawing(size=('100%', '100%'), viewBox=f'0 0 {width} {height}')
-        
-        # 设置背景为米色
-        dwg.add(dwg.rect(insert=(0, 0), size=('100%', '100%'), fill='#FAF6F1'))
-        
-        # 添加标题
-        dwg.add(dwg.text('汉语新解', insert=(width/2, 20), font_size=8, font_family='Noto Sans SC', 
-                        text_anchor='middle', fill='#333333'))
-        
-        # 添加分隔线
-        dwg.add(dwg.line(start=(width*0.15, 28), end=(width*0.85, 28), 
-                        stroke='#333333', stroke_width=0.5))
-        
-        # 添加汉字
-        dwg.add(dwg.text(word, insert=(width/2, 65), font_size=20, font_family='Noto Sans SC', 
-                        text_anchor='middle', fill='#333333'))
-        
         # 添加拼音
-        pinyin = self._get_pinyin(word)
-        dwg.add(dwg.text(pinyin, insert=(width/2, 85), font_size=8, font_family='Noto Sans SC', 
-                        text_anchor='middle', fill='#666666'))
-        
-        # 添加解释文字
-        interpretation = interpretation.strip('"')  # 去掉可能存在的双引号
+        with STAGE_SECONDS.time(stage="pinyin"):
+            pinyin = self._get_pinyin(word)
         
-        # 计算每行最大字符数（根据字体大小和SVG宽度）
-        max_chars = int((width * 0.7) / 8)  # 8px 是字体大小，留出 30% 边距
-        lines = self._wrap_text(interpretation, max_chars)
-        
-        # 计算文本总高度和行间距
-        available_height = height - 110  # 110 是文本开始的y坐标
-        total_lines = len(lines)
-        line_height = min(16, available_height / (total_lines + 1))  # 确保至少留出一行的空间
-        
-        # 添加文字
-        y = 110
-        for i, line in enumerate(lines):
-            if y + line_height > height - 10:  # 留出底部 10px 的边距
-                break
-            dwg.add(dwg.text(line, insert=(width/2, y), font_size=8, font_family='Noto Sans SC', 
-                            text_anchor='middle', fill='#333333'))
-            y += line_height
-        
-        return dwg.tostring()
+        with STAGE_SECONDS.time(stage="svg_render"):
+            # 去掉可能存在的双引号
+            interpretation = interpretation.strip('"')
+            
+            # 按字宽换行，排不下时自动缩小字号
+            font_size, lines = svg_card.layout_interpretation(interpretation)
+            
+            return svg_card.render_card(word, pinyin, lines, font_size)
         
     async def interpret(self, word: str, llm_adapter: Optional[LLMAdapter] = None) -> str:
         """Main interpretation function"""
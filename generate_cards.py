@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+离线批量生成词语卡片
+
+从文件或标准输入逐行读取词语，按有界并发调用 LLM（支持多词打包的提供商会打包请求），
+拼音和 SVG 渲染在进程池中完成。卡片按内容的 SHA-256 存放在分片目录
+<输出目录>/svg/ab/cd/<sha256>.svg 中，内容相同的卡片只保存一份。
+
+--raster png webp 同时导出栅格图片，按 --scale 指定的倍数保存为
+<输出目录>/<格式>/ab/cd/<sha256>@<倍数>x.<格式>，以 SVG 的哈希命名，已存在的文件不会重复栅格化。
+
+每完成一个词语就向 <输出目录>/checkpoint.jsonl 追加一行记录。任务中断后用相同参数
+重新运行，会跳过已记录的词语继续处理。结束或中断时，把全部记录整理为
+<输出目录>/manifest.json。
+
+LLM 失败而使用默认解释的词语仍会生成卡片，但在清单中标记 "fallback": true 并计入
+fallbacks，不写入检查点，用相同参数重新运行时会再次尝试生成。
+
+用法：
+    python generate_cards.py words.txt --model deepseek --out cards
+    cat words.txt | python generate_cards.py - --model zhipuai --concurrency 16 --workers 8
+    python generate_cards.py words.txt --raster png webp --scale 1 2
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+import raster
+
+from chinese_word_reinterpreter import ChineseWordReinterpreter, preload_pinyin
+from interpretation_cache import InterpretationCache
+from llm_adapter import LLMAdapter, get_llm_adapter, registry
+from logging_config import setup_logging
+from rate_limit import RateLimitExceeded
+from task_pool import map_unordered
+
+logger = logging.getLogger("generate_cards")
+
+CHECKPOINT_NAME = "checkpoint.jsonl"
+MANIFEST_NAME = "manifest.json"
+
+# 渲染进程内的解释器实例，由 _init_worker 创建
+_worker_interpreter: Optional[ChineseWordReinterpreter] = None
+
+
+def _init_worker(raster_backend: Optional[str] = None) -> None:
+    global _worker_interpreter
+    # spawn 启动的进程不会执行 main()，日志需要在这里重新配置
+    setup_logging()
+    preload_pinyin()
+    _worker_interpreter = ChineseWordReinterpreter()
+    if raster_backend:
+        # 每个渲染进程只加载一次字体
+        raster.init_worker(raster_backend)
+
+
+def card_path(digest: str, fmt: str = "svg", scale: Optional[float] = None) -> str:
+    """内容地址对应的相对路径，两级目录各取哈希的两个字符"""
+    name = digest if scale is None else f"{digest}@{scale:g}x"
+    return os.path.join(fmt, digest[:2], digest[2:4], f"{name}.{fmt}")
+
+
+def _write_once(target: str, produce) -> None:
+    """目标文件不存在时生成并写入；先写临时文件再改名，中断时不会留下半个文件"""
+    if os.path.exists(target):
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(produce())
+    os.replace(tmp, target)
+
+
+def render_card(out_dir: str, word: str, interpretation: str,
+                rasters: Sequence[Tuple[str, float]] = ()) -> Dict[str, object]:
+    """在渲染进程中生成拼音、SVG 和栅格图片，按内容哈希写入分片目录，返回清单记录"""
+    svg = _worker_interpreter._create_svg_card(word, interpretation).encode("utf-8")
+    digest = hashlib.sha256(svg).hexdigest()
+    path = card_path(digest)
+    _write_once(os.path.join(out_dir, path), lambda: svg)
+    entry = {"word": word, "pinyin": _worker_interpreter._get_pinyin(word), "interpretation": interpretation,
+             "sha256": digest, "path": path}
+    if rasters:
+        entry["rasters"] = {}
+        for fmt, scale in rasters:
+            raster_path = card_path(digest, fmt, scale)
+            _write_once(os.path.join(out_dir, raster_path), lambda: raster.rasterize(svg, fmt, scale))
+            entry["rasters"][f"{fmt}@{scale:g}x"] = raster_path
+    return entry
+
+
+def read_words(source: TextIO) -> Iterator[str]:
+    for line in source:
+        word = line.strip()
+        if word and not word.startswith("#"):
+            yield word
+
+
+def load_checkpoint(path: str) -> Dict[str, dict]:
+    """读取已完成的记录；进程被强制结束时最后一行可能不完整，直接忽略"""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            done[entry["word"]] = entry
+    return done
+
+
+def write_manifest(out_dir: str, model: str, entries: Dict[str, dict]) -> None:
+    manifest = {
+        "model": model,
+        "count": len(entries),
+        "fallbacks": sum(1 for entry in entries.values() if entry.get("fallback")),
+        "cards": sorted(entries.values(), key=lambda entry: entry["word"]),
+    }
+    target = os.path.join(out_dir, MANIFEST_NAME)
+    with open(f"{target}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(f"{target}.tmp", target)
+
+
+def chunked(words: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk = []
+    for word in words:
+        chunk.append(word)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class CardJob:
+    def __init__(self, interpreter: ChineseWordReinterpreter, adapter: Optional[LLMAdapter],
+                 pool: ProcessPoolExecutor, out_dir: str, rasters: Sequence[Tuple[str, float]] = ()):
+        self.interpreter = interpreter
+        self.adapter = adapter
+        self.pool = pool
+        self.out_dir = out_dir
+        self.rasters = rasters
+
+    async def interpret(self, words: List[str]) -> Tuple[Dict[str, str], List[str]]:
+        """返回 ({词语: 解释}, LLM 失败而使用默认解释的词语)"""
+        if self.adapter is None:
+            return {word: self.interpreter._generate_critical_interpretation(word) for word in words}, []
+        while True:
+            try:
+                return await self.interpreter.interpret_words(words, self.adapter)
+            except RateLimitExceeded as e:
+                # 离线任务不丢弃被限流的词语，等待建议的时间后重试
+                logger.info("限流，稍后重试", extra={"provider": e.provider, "retry_after": e.retry_after, "count": len(words)})
+                await asyncio.sleep(e.retry_after)
+
+    async def process(self, words: List[str]) -> List[dict]:
+        interpretations, fallbacks = await self.interpret(words)
+        loop = asyncio.get_running_loop()
+        entries = await asyncio.gather(*(
+            loop.run_in_executor(self.pool, render_card, self.out_dir, word, interpretations[word], self.rasters)
+            for word in words
+        ))
+        for entry in entries:
+            if entry["word"] in fallbacks:
+                entry["fallback"] = True
+        return entries
+
+
+async def run(args, source: TextIO) -> int:
+    os.makedirs(args.out, exist_ok=True)
+    checkpoint_path = os.path.join(args.out, CHECKPOINT_NAME)
+    done = load_checkpoint(checkpoint_path)
+    if done:
+        logger.info("从检查点恢复", extra={"done": len(done)})
+
+    adapter = None
+    if args.model != "none":
+        adapter = get_llm_adapter(args.model)
+        if adapter is None:
+            sys.exit(f"不支持的模型类型：{args.model}")
+    cache = None if args.no_cache else InterpretationCache.from_env()
+    interpreter = ChineseWordReinterpreter(cache=cache)
+    batch_size = args.batch_size or (adapter.batch_size if adapter is not None else 32)
+    rasters = [(fmt, scale) for fmt in args.raster for scale in args.scale]
+    raster_backend = None
+    if rasters:
+        try:
+            raster_backend = raster.check_backend(args.raster_backend)
+        except raster.RasterUnavailable as e:
+            sys.exit(str(e))
+
+    def pending_words():
+        seen = set(done)
+        for word in read_words(source):
+            if word not in seen:
+                seen.add(word)
+                yield word
+
+    completed = 0
+    fallbacks = 0
+    start = time.perf_counter()
+    # 此时日志后台线程和事件循环都已运行，fork 出的进程会继承一个无人读取的日志队列，
+    # 工作进程的日志全部丢失；与 raster 一样使用 spawn
+    pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker, initargs=(raster_backend,))
+    with pool, \
+            open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        job = CardJob(interpreter, adapter, pool, args.out, rasters)
+        try:
+            async for entries in map_unordered(job.process, chunked(pending_words(), batch_size), args.concurrency):
+                for entry in entries:
+                    # 默认解释的卡片只进清单，不进检查点，下次运行时重新生成
+                    if entry.get("fallback"):
+                        fallbacks += 1
+                    else:
+                        checkpoint.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                    done[entry["word"]] = entry
+                checkpoint.flush()
+                completed += len(entries)
+                if completed % args.progress_every < len(entries):
+                    elapsed = time.perf_counter() - start
+                    logger.info("生成进度", extra={"completed": completed, "rate": completed / elapsed})
+        finally:
+            write_manifest(args.out, args.model, done)
+            await registry.aclose()
+            if cache is not None:
+                cache.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"本次生成 {completed} 张卡片，用时 {elapsed:.1f} 秒；清单共 {len(done)} 条：{os.path.join(args.out, MANIFEST_NAME)}")
+    if fallbacks:
+        print(f"其中 {fallbacks} 个词语 LLM 生成失败，使用了默认解释，未写入检查点；用相同参数重新运行可再次尝试")
+    return completed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="词语列表文件，每行一个；- 表示标准输入")
+    parser.add_argument("--model", default="zhipuai", help="LLM 模型，none 表示只使用内置解释")
+    parser.add_argument("--out", default="cards", help="输出目录")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时进行的 LLM 请求数")
+    parser.add_argument("--batch-size", type=int, default=0, help="每个 LLM 请求打包的词语数，默认取提供商配置")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="渲染进程数")
+    parser.add_argument("--progress-every", type=int, default=1000, help="每完成多少个词语输出一次进度")
+    parser.add_argument("--no-cache", action="store_true", help="不读写解释缓存")
+    parser.add_argument("--raster", nargs="+", choices=sorted(raster.FORMATS), default=[], help="同时导出的栅格格式")
+    parser.add_argument("--scale", nargs="+", type=float, default=[2.0], help="栅格图片的缩放倍数")
+    parser.add_argument("--raster-backend", default=os.getenv("RASTER_BACKEND", "auto"),
+                        choices=["auto", "cairosvg", "pillow"], help="栅格化后端")
+    args = parser.parse_args()
+
+    setup_logging()
+    if args.input == "-":
+        asyncio.run(run(args, sys.stdin))
+    else:
+        with open(args.input, encoding="utf-8") as source:
+            asyncio.run(run(args, source))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+解释缓存：进程内 LRU + SQLite 持久化两级缓存
+
+键由 (词语, 适配器, 提示词版本) 组成，命中时完全跳过 LLM 调用。
+只缓存 LLM 成功生成的解释；LLM 调用失败时适配器抛出异常，兜底文本不会进入缓存。
+SQLite 文件以 WAL 模式打开，多个工作进程共享同一个持久层。
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import shared_db
+from llm_adapter import PROMPT_VERSION
+
+DEFAULT_CACHE_PATH = ".cache/interpretations.sqlite3"
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MEMORY_SIZE = 1024
+DEFAULT_DISK_SIZE = 100_000
+
+
+class InterpretationCache:
+    def __init__(self, path: Optional[str] = DEFAULT_CACHE_PATH, ttl: float = DEFAULT_TTL,
+                 max_memory_items: int = DEFAULT_MEMORY_SIZE, max_disk_items: int = DEFAULT_DISK_SIZE,
+                 prompt_version: str = PROMPT_VERSION):
+        self.ttl = ttl
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.prompt_version = prompt_version
+
+        # key -> (解释, 过期时间)
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "memory_evictions": 0,
+        }
+
+        # 只读文件系统（如 Vercel）上打不开时退化为纯内存缓存
+        self._disk: Optional[shared_db.SharedTable] = None
+        if path:
+            self._disk = shared_db.SharedTable.open(path, "interpretations", "interpretation", "TEXT", ttl=ttl,
+                                                    max_items=max_disk_items, label="解释缓存")
+
+    @classmethod
+    def from_env(cls) -> "InterpretationCache":
+        """根据环境变量创建缓存，INTERPRETATION_CACHE_PATH 为空时只使用内存层"""
+        return cls(
+            path=os.getenv("INTERPRETATION_CACHE_PATH", DEFAULT_CACHE_PATH),
+            ttl=float(os.getenv("INTERPRETATION_CACHE_TTL", DEFAULT_TTL)),
+            max_memory_items=int(os.getenv("INTERPRETATION_CACHE_MEMORY_SIZE", DEFAULT_MEMORY_SIZE)),
+            max_disk_items=int(os.getenv("INTERPRETATION_CACHE_DISK_SIZE", DEFAULT_DISK_SIZE)),
+        )
+
+    def make_key(self, word: str, adapter_name: str) -> str:
+        return f"{self.prompt_version}\x1f{adapter_name}\x1f{word}"
+
+    def get(self, word: str, adapter_name: str) -> Optional[str]:
+        """查询缓存，未命中或已过期时返回 None"""
+        key = self.make_key(word, adapter_name)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                interpretation, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return interpretation
+                del self._memory[key]
+
+            if self._disk is not None:
+                row = self._disk.get(key)
+                if row is not None:
+                    interpretation, expires_at = row
+                    self._remember(key, interpretation, expires_at)
+                    self._stats["disk_hits"] += 1
+                    return interpretation
+
+            self._stats["misses"] += 1
+            return None
+
+    def peek(self, word: str, adapter_name: str) -> Optional[str]:
+        """只查内存层，不更新 LRU 顺序和命中统计；刚生成或刚读取的解释总在内存层中"""
+        entry = self._memory.get(self.make_key(word, adapter_name))
+        if entry is not None and entry[1] > time.time():
+            return entry[0]
+        return None
+
+    def set(self, word: str, adapter_name: str, interpretation: str) -> None:
+        """写入缓存，调用方负责只传入 LLM 成功生成的解释"""
+        key = self.make_key(word, adapter_name)
+        with self._lock:
+            self._remember(key, interpretation, time.time() + self.ttl)
+            self._stats["stores"] += 1
+            if self._disk is not None:
+                self._disk.set(key, interpretation)
+
+    def _remember(self, key: str, interpretation: str, expires_at: float) -> None:
+        self._memory[key] = (interpretation, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self._stats["memory_evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._disk is not None:
+                self._disk.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_items"] = len(self._memory)
+            stats["disk_evictions"] = self._disk.evictions if self._disk is not None else 0
+        stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
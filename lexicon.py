@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地词库：拼音、英日翻译和预置解释
+
+词库是一个只读的 SQLite 文件（默认 .cache/lexicon.sqlite3），以词语为主键的
+WITHOUT ROWID 表，索引在构建时一次建好。运行时按只读方式打开并启用内存映射，
+单词查询走主键 B 树并经过进程内 LRU，热词查询是一次字典访问；前缀查询按主键
+做范围扫描，供 /suggest 接口使用。有预置解释的词语直接返回，不调用 LLM。
+
+词库文件不存在时（如 Vercel 等只读部署）只使用内置的几个词条。
+
+构建：
+    python lexicon.py build words.jsonl extra.tsv --out .cache/lexicon.sqlite3
+
+JSONL 每行一个对象：{"word", "pinyin", "en", "ja", "interpretation", "freq"}，除 word 外都可省略；
+TSV 每行依次为 词语、拼音、英文、日文、解释、词频，空列表示没有。多个文件中的同一词语会合并，
+后出现的非空字段覆盖前面的字段。
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEXICON_PATH = ".cache/lexicon.sqlite3"
+# 单词查询的 LRU 条目上限和 SQLite 内存映射大小（字节）
+LEXICON_CACHE_SIZE = int(os.getenv("LEXICON_CACHE_SIZE", 65536))
+LEXICON_MMAP_SIZE = int(os.getenv("LEXICON_MMAP_SIZE", 256 * 1024 * 1024))
+
+FIELDS = ("word", "pinyin", "en", "ja", "interpretation", "freq")
+
+# 内置词条，词库文件缺失时使用，构建词库时也会先写入
+BUILTIN_ENTRIES = (
+    ("出人头地", "chū rén tóu dì", "stand out from the crowd", "頭角を現す",
+     "在一个人人低头的时代，有人选择抬起头来 —— 然后发现自己成了靶子。"),
+    ("委婉", "wěi wǎn", "tactful", "婉曲", "刺向他人时, 决定在剑刃上撒上止痛药。"),
+    ("效率", "xiào lǜ", "efficiency", "効率", "用最快的速度完成错误的事情。"),
+    ("会议", "huì yì", "meeting", "会議", "一群人坐在一起，互相浪费时间的艺术。"),
+    ("加班", "jiā bān", "overtime", "残業", "用生命为资本家的游艇添砖加瓦。"),
+    ("团建", "tuán jiàn", "team building", "チームビルディング", "强制性的快乐，预算内的友谊。"),
+)
+
+_SCHEMA = (
+    "CREATE TABLE entries ("
+    " word TEXT PRIMARY KEY,"
+    " pinyin TEXT,"
+    " en TEXT,"
+    " ja TEXT,"
+    " interpretation TEXT,"
+    " freq INTEGER NOT NULL DEFAULT 0"
+    ") WITHOUT ROWID",
+    "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID",
+)
+
+_UPSERT = (
+    "INSERT INTO entries (word, pinyin, en, ja, interpretation, freq) VALUES (?, ?, ?, ?, ?, ?)"
+    " ON CONFLICT(word) DO UPDATE SET"
+    " pinyin = COALESCE(excluded.pinyin, pinyin),"
+    " en = COALESCE(excluded.en, en),"
+    " ja = COALESCE(excluded.ja, ja),"
+    " interpretation = COALESCE(excluded.interpretation, interpretation),"
+    " freq = MAX(freq, excluded.freq)"
+)
+
+_COLUMNS = ", ".join(FIELDS)
+
+# 前缀范围扫描的上界：UTF-8 字节序下最大的码位
+_PREFIX_END = "\U0010ffff"
+
+
+class LexiconEntry(NamedTuple):
+    word: str
+    pinyin: Optional[str]
+    en: Optional[str]
+    ja: Optional[str]
+    interpretation: Optional[str]
+    freq: int
+
+
+class Lexicon:
+    def __init__(self, db: sqlite3.Connection, path: Optional[str] = None, cache_size: int = LEXICON_CACHE_SIZE):
+        self.path = path
+        self._db = db
+        self._lock = threading.Lock()
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    @classmethod
+    def open(cls, path: str, cache_size: int = LEXICON_CACHE_SIZE, mmap_size: int = LEXICON_MMAP_SIZE) -> "Lexicon":
+        """只读打开词库文件"""
+        db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        db.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+        db.execute("PRAGMA query_only = 1")
+        return cls(db, path, cache_size)
+
+    @classmethod
+    def builtin(cls) -> "Lexicon":
+        """只包含内置词条的内存词库"""
+        db = sqlite3.connect(":memory:", check_same_thread=False)
+        _create(db)
+        db.executemany(_UPSERT, _builtin_rows())
+        return cls(db)
+
+    def _lookup(self, word: str) -> Optional[LexiconEntry]:
+        with self._lock:
+            row = self._db.execute(f"SELECT {_COLUMNS} FROM entries WHERE word = ?", (word,)).fetchone()
+        return LexiconEntry(*row) if row is not None else None
+
+    def interpretation(self, word: str) -> Optional[str]:
+        entry = self.lookup(word)
+        return entry.interpretation if entry is not None else None
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[LexiconEntry]:
+        """以 prefix 开头的词语，按词频从高到低"""
+        if not prefix:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM entries WHERE word >= ? AND word < ?"
+                " ORDER BY freq DESC, word LIMIT ?",
+                (prefix, prefix + _PREFIX_END, limit),
+            ).fetchall()
+        return [LexiconEntry(*row) for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        info = self.lookup.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "cached": info.currsize}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def _create(db: sqlite3.Connection) -> None:
+    for statement in _SCHEMA:
+        db.execute(statement)
+
+
+def _builtin_rows() -> Iterator[Tuple]:
+    for word, pinyin, en, ja, interpretation in BUILTIN_ENTRIES:
+        yield word, pinyin, en, ja, interpretation, 0
+
+
+def _row(fields: Dict) -> Optional[Tuple]:
+    word = (fields.get("word") or "").strip()
+    if not word:
+        return None
+    values = [word]
+    for name in FIELDS[1:-1]:
+        value = fields.get(name)
+        values.append((value.strip() or None) if isinstance(value, str) else None)
+    try:
+        values.append(int(fields.get("freq") or 0))
+    except (TypeError, ValueError):
+        values.append(0)
+    return tuple(values)
+
+
+def read_source(path: str) -> Iterator[Tuple]:
+    """逐行读取 JSONL 或 TSV 词条，跳过空行、# 注释和格式错误的行"""
+    is_jsonl = path.endswith((".jsonl", ".json"))
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip() or line.startswith("#"):
+                continue
+            if is_jsonl:
+                try:
+                    fields = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("不是合法的 JSON，已跳过", extra={"path": path, "line": number})
+                    continue
+            else:
+                fields = dict(zip(FIELDS, line.rstrip("\n").split("\t")))
+            row = _row(fields) if isinstance(fields, dict) else None
+            if row is not None:
+                yield row
+
+
+def build(sources: Iterable[str], out: str, include_builtin: bool = True) -> int:
+    """
+    把词条文件写入新的词库，返回词条数
+
+    先写临时文件再改名替换，正在运行的服务读到的总是完整的旧文件或新文件。
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    tmp = f"{out}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    db = sqlite3.connect(tmp, isolation_level=None)
+    try:
+        # 构建是一次性的离线任务，关闭日志和同步以加快写入
+        db.execute("PRAGMA journal_mode = OFF")
+        db.execute("PRAGMA synchronous = OFF")
+        db.execute("BEGIN")
+        _create(db)
+        if include_builtin:
+            db.executemany(_UPSERT, _builtin_rows())
+        for source in sources:
+            db.executemany(_UPSERT, read_source(source))
+        (count,) = db.execute("SELECT COUNT(*) FROM entries").fetchone()
+        db.executemany("INSERT INTO meta (key, value) VALUES (?, ?)",
+                       [("count", str(count)), ("built_at", time.strftime("%Y-%m-%dT%H:%M:%S"))])
+        db.execute("COMMIT")
+        db.execute("ANALYZE")
+        db.execute("VACUUM")
+    finally:
+        db.close()
+    os.replace(tmp, out)
+    return count
+
+
+_lexicon: Optional[Lexicon] = None
+_lexicon_pid: Optional[int] = None
+_lexicon_lock = threading.Lock()
+
+
+def get_lexicon() -> Lexicon:
+    """进程共享的词库，按 LEXICON_PATH 打开；fork 出的子进程会重新打开自己的连接"""
+    global _lexicon, _lexicon_pid
+    if _lexicon is None or _lexicon_pid != os.getpid():
+        with _lexicon_lock:
+            if _lexicon is None or _lexicon_pid != os.getpid():
+                path = os.getenv("LEXICON_PATH", DEFAULT_LEXICON_PATH)
+                lexicon = None
+                if path and os.path.exists(path):
+                    try:
+                        lexicon = Lexicon.open(path)
+                    except sqlite3.Error as e:
+                        logger.warning("无法打开词库，仅使用内置词条", extra={"path": path, "error": str(e)})
+                _lexicon = lexicon or Lexicon.builtin()
+                _lexicon_pid = os.getpid()
+    return _lexicon
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="从 JSONL/TSV 文件构建词库")
+    build_parser.add_argument("sources", nargs="+", help="词条文件")
+    build_parser.add_argument("--out", default=os.getenv("LEXICON_PATH") or DEFAULT_LEXICON_PATH, help="词库文件路径")
+    build_parser.add_argument("--no-builtin", action="store_true", help="不写入内置词条")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    start = time.perf_counter()
+    count = build(args.sources, args.out, include_builtin=not args.no_builtin)
+    print(f"已写入 {count} 个词条到 {args.out}，用时 {time.perf_counter() - start:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,241 +1,997 @@
 import os
+import logging
 from abc import ABC, abstractmethod
-from typing import Optional
-import openai
-from zhipuai import ZhipuAI
-import google.generativeai as genai
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
 from dotenv import load_dotenv
 import asyncio
 from functools import partial
-import aiohttp
 import json
+import re
+import time
+import threading
+from contextlib import asynccontextmanager
+from provider_router import ProviderRouter, RoutingError
+from task_pool import map_unordered
+from logging_config import log_payload
+from metrics import BATCH_WORDS, LLM_CALL_SECONDS, LLM_RETRIES, RATE_LIMITED, STAGE_SECONDS
+from provider_executor import get_executor, shutdown_executors
+from rate_limit import ProviderLimiter, RateLimitExceeded, get_limiter, parse_retry_after, retry_async
+
+# 各提供商 SDK 和 aiohttp 的导入开销较大，只在对应适配器首次构建或首次发请求时导入，
+# 以缩短冷启动时间（如 Vercel 无服务器函数），每个请求只会用到其中一个提供商；
+# 这里只为类型注解导入
+if TYPE_CHECKING:
+    import aiohttp
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# 修改提示词时递增，旧版本提示词生成的缓存会自然失效
+PROMPT_VERSION = "1"
+
+SYSTEM_PROMPT = "你是一个擅长用批判性、机智幽默的方式解读中文词语的AI。你的风格类似于王尔德、鲁迅和骆永华的结合，善于使用隐喻和讽刺。请直接给出解释，不要加任何引号。"
+
+def build_user_prompt(word: str) -> str:
+    return f"请用一句话解释{word}这个词，要求：\n1. 批判性地解读这个词背后的社会现象\n2. 使用机智幽默的语言\n3. 可以使用隐喻和讽刺\n4. 长度在50字以内\n5. 直接给出解释，不要加任何引号"
+
+def build_batch_prompt(words: List[str]) -> str:
+    """把多个词语打包进一个请求，要求以 JSON 对象返回，键为词语、值为解释"""
+    return (
+        "请分别用一句话解释下面每个词语，要求：\n1. 批判性地解读这个词背后的社会现象\n2. 使用机智幽默的语言\n"
+        "3. 可以使用隐喻和讽刺\n4. 每个解释长度在50字以内\n5. 解释中不要加任何引号\n\n"
+        "只输出一个 JSON 对象，键为词语原文，值为对应的解释，不要输出 JSON 以外的任何内容。\n"
+        f"词语：{json.dumps(words, ensure_ascii=False)}"
+    )
+
+# 批量回复中每个词语预留的输出 token 数
+BATCH_TOKENS_PER_WORD = 120
+_QUOTES = "\"'“”‘’「」『』"
+
+def _clean_interpretation(value) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    value = value.strip().strip(_QUOTES).strip()
+    if not value or value.startswith("抱歉") or len(value) > 200:
+        return None
+    return value
+
+def _loads_json_fragment(text: str):
+    """解析文本中第一个 { 或 [ 到与之同类的最后一个闭合括号之间的 JSON"""
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return None
+    start = min(starts)
+    end = text.rfind("}" if text[start] == "{" else "]")
+    if end <= start:
+        return None
+    try:
+        return json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+
+# 逐行解析时去掉的列表标记，如 "- "、"1. "、"2) "、"**"；词语本身可以包含数字（如 996）
+_LINE_MARKER = re.compile(r'^[\s\-*#>`]*(?:\d+[.)、]\s*)?[\s*`]*')
+_JSON_PAIR = re.compile(r'"((?:[^"\\]|\\.)+)"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+def parse_batch_reply(text: str, words: List[str]) -> Dict[str, str]:
+    """
+    从批量回复中解析出 {词语: 解释}，只保留请求中的词语和有效的解释
+
+    依次尝试：JSON 对象（允许包在代码块或前后有多余文字中）、
+    JSON 数组（[{"word", "interpretation"}] 或与词语一一对应的字符串列表），
+    都失败时（如回复被 max_tokens 截断）从文本中逐个提取 "词语": "解释" 和 “词语：解释” 行。
+    解析不出的词语不出现在结果中，由调用方单独重试。
+    """
+    wanted = set(words)
+    pairs = []
+    data = _loads_json_fragment(text)
+    if isinstance(data, dict):
+        pairs = list(data.items())
+    elif isinstance(data, list):
+        if all(isinstance(item, dict) for item in data):
+            pairs = [(item.get("word"), item.get("interpretation") or item.get("explanation")) for item in data]
+        elif len(data) == len(words):
+            pairs = list(zip(words, data))
+    else:
+        for key, value in _JSON_PAIR.findall(text):
+            try:
+                pairs.append((json.loads(f'"{key}"'), json.loads(f'"{value}"')))
+            except json.JSONDecodeError:
+                continue
+        for line in text.splitlines():
+            key, sep, value = line.replace("：", ":").partition(":")
+            if sep:
+                pairs.append((_LINE_MARKER.sub("", key).strip(" *`\"'“”"), value))
+
+    result = {}
+    for key, value in pairs:
+        key = key.strip() if isinstance(key, str) else key
+        interpretation = _clean_interpretation(value)
+        if key in wanted and key not in result and interpretation:
+            result[key] = interpretation
+    return result
+
+# 各提供商接口地址可通过 OPENAI_BASE_URL、ZHIPUAI_BASE_URL、QWEN_BASE_URL、DEEPSEEK_BASE_URL
+# 覆盖，例如指向 benchmarks/mock_llm_server.py 做压测
+
+# 每个提供商共享的 HTTP 连接池配置
+HTTP_POOL_LIMIT = int(os.getenv('LLM_HTTP_POOL_LIMIT', 100))
+HTTP_DNS_CACHE_TTL = int(os.getenv('LLM_HTTP_DNS_CACHE_TTL', 300))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('LLM_HTTP_KEEPALIVE_TIMEOUT', 30))
+# 单次 LLM 调用的超时时间（秒），避免提供商无响应时请求一直挂起
+LLM_REQUEST_TIMEOUT = float(os.getenv('LLM_REQUEST_TIMEOUT', 30))
+# 提供商返回 429/5xx 时的重试次数和退避参数（秒）
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 2))
+LLM_RETRY_BASE_DELAY = float(os.getenv('LLM_RETRY_BASE_DELAY', 0.5))
+LLM_RETRY_MAX_DELAY = float(os.getenv('LLM_RETRY_MAX_DELAY', 8))
+
+# 可重试的 HTTP 状态码：限流和服务端临时故障
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+class LLMError(Exception):
+    """LLM 调用失败"""
+
+class ProviderHTTPError(LLMError):
+    """提供商返回了可重试的 HTTP 错误（429/5xx），retry_after 为提供商要求的等待秒数"""
+
+    def __init__(self, status: int, message: str = "", retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status}: {message}" if message else f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+class ProviderUnavailable(RateLimitExceeded):
+    """
+    提供商持续返回 429/5xx：重试用尽，或要求的等待超过 LLM_RETRY_MAX_DELAY
+
+    按限流处理而不是降级为兜底解释，接口层返回 503 和 Retry-After；
+    提供商没有给出 Retry-After 时建议等待 LLM_RETRY_MAX_DELAY 秒。
+    """
+
+    def __init__(self, provider: str, error: ProviderHTTPError):
+        super().__init__(provider, error.retry_after if error.retry_after is not None else LLM_RETRY_MAX_DELAY)
+        self.status = error.status
+
+def provider_http_error(e: Exception) -> Optional[ProviderHTTPError]:
+    """把 SDK 抛出的 429/5xx 异常转换为 ProviderHTTPError，其他异常返回 None"""
+    # openai/zhipuai 的异常带 status_code 和 response，google.api_core 的异常带 code
+    status = getattr(e, 'status_code', None) or getattr(e, 'code', None)
+    if not isinstance(status, int) or status not in RETRYABLE_STATUSES:
+        return None
+    headers = getattr(getattr(e, 'response', None), 'headers', None) or {}
+    return ProviderHTTPError(int(status), str(e), parse_retry_after(headers.get('retry-after')))
+
+def _classify_retry(e: BaseException):
+    if isinstance(e, ProviderHTTPError):
+        return True, e.retry_after
+    return False, None
+
 class LLMAdapter(ABC):
-    @abstractmethod
+    # 适配器名称，与 get_llm_adapter 的模型名一致，用作缓存键的一部分
+    name: str = ""
+    # 是否对该适配器的调用做限流和重试；auto 模式由底层提供商各自限流
+    rate_limited: bool = True
+
+    @property
+    def limiter(self) -> Optional[ProviderLimiter]:
+        return get_limiter(self.name) if self.rate_limited else None
+
+    @asynccontextmanager
+    async def _slot(self):
+        """占用一个限流名额，队列已满时抛出 RateLimitExceeded"""
+        limiter = self.limiter
+        if limiter is None:
+            yield
+            return
+        try:
+            await limiter.acquire()
+        except RateLimitExceeded:
+            RATE_LIMITED.inc(provider=self.name)
+            raise
+        try:
+            yield
+        finally:
+            limiter.release()
+
+    def _on_retry(self, e: BaseException, delay: float) -> None:
+        LLM_RETRIES.inc(provider=self.name)
+        logger.warning("LLM 调用失败，稍后重试", extra={"provider": self.name, "delay": delay, "error": str(e)})
+
+    async def _retry(self, fn):
+        try:
+            return await retry_async(fn, _classify_retry, attempts=LLM_MAX_RETRIES + 1,
+                                     base_delay=LLM_RETRY_BASE_DELAY, max_delay=LLM_RETRY_MAX_DELAY,
+                                     on_retry=self._on_retry)
+        except ProviderHTTPError as e:
+            raise ProviderUnavailable(self.name, e) from e
+
     async def generate_interpretation(self, word: str) -> str:
+        """
+        生成解释并按提供商记录耗时，失败时抛出 LLMError，不会把错误信息当作解释返回
+
+        每次尝试都要经过提供商限流器；429/5xx 按退避重试。本地限流拒绝时抛出
+        RateLimitExceeded，提供商重试后仍返回 429/5xx 时抛出其子类 ProviderUnavailable，
+        由调用方决定返回 503 还是换用其他提供商。
+        """
+        async def attempt():
+            async with self._slot():
+                interpretation = await self._generate_interpretation(word)
+            if not interpretation or not interpretation.strip():
+                raise LLMError("空响应")
+            return interpretation
+
+        start = time.perf_counter()
+        try:
+            interpretation = await self._retry(attempt)
+        except RateLimitExceeded as e:
+            outcome = "error" if isinstance(e, ProviderUnavailable) else "rejected"
+            LLM_CALL_SECONDS.observe(time.perf_counter() - start, provider=self.name, outcome=outcome)
+            raise
+        except Exception as e:
+            latency = time.perf_counter() - start
+            LLM_CALL_SECONDS.observe(latency, provider=self.name, outcome="error")
+            logger.warning("LLM 调用失败", extra={"provider": self.name, "word": word, "latency": latency,
+                                                "error": str(e)})
+            if isinstance(e, LLMError):
+                raise
+            raise LLMError(str(e)) from e
+        latency = time.perf_counter() - start
+        LLM_CALL_SECONDS.observe(latency, provider=self.name, outcome="ok")
+        logger.debug("LLM 调用完成", extra={"provider": self.name, "word": word, "latency": latency})
+        return interpretation
+
+    @abstractmethod
+    async def _generate_interpretation(self, word: str) -> str:
+        """返回模型生成的解释，失败时抛出 LLMError（可重试的错误为 ProviderHTTPError）"""
+
+    async def stream_interpretation(self, word: str) -> AsyncIterator[str]:
+        """
+        逐段产出解释文本，失败时抛出异常而不是返回 "抱歉…" 文本
+
+        整个流占用一个限流名额；首个分片到达前遇到 429/5xx 会按退避重试，之后的错误直接抛出。
+        """
+        async def open_stream():
+            slot = self._slot()
+            await slot.__aenter__()
+            stream = self._stream_interpretation(word).__aiter__()
+            try:
+                first = await stream.__anext__()
+            except StopAsyncIteration:
+                first = None
+            except BaseException:
+                await stream.aclose()
+                await slot.__aexit__(None, None, None)
+                raise
+            return slot, stream, first
+
+        slot, stream, first = await self._retry(open_stream)
+        try:
+            if first is None:
+                return
+            yield first
+            async for text in stream:
+                yield text
+        finally:
+            await stream.aclose()
+            await slot.__aexit__(None, None, None)
+
+    @property
+    def batch_size(self) -> int:
+        """每个请求打包的词语数，<PROVIDER>_BATCH_SIZE 优先于 LLM_BATCH_SIZE"""
+        value = os.getenv(f"{self.name.upper()}_BATCH_SIZE") or os.getenv("LLM_BATCH_SIZE")
+        return max(1, int(value)) if value else 10
+
+    @abstractmethod
+    async def _complete(self, prompt: str, max_tokens: int, json_mode: bool = False) -> str:
+        """
+        用 SYSTEM_PROMPT 和给定的用户提示词做一次补全，返回原始回复文本
+
+        失败时抛出 LLMError（可重试的错误为 ProviderHTTPError）。
+        json_mode 为 True 时，支持 JSON 输出模式的提供商会要求模型只输出 JSON。
+        """
+
+    async def _limited_complete(self, prompt: str, max_tokens: int, json_mode: bool = False) -> str:
+        """经过提供商限流器调用 _complete，429/5xx 按退避重试"""
+        async def attempt():
+            async with self._slot():
+                return await self._complete(prompt, max_tokens, json_mode)
+
+        return await self._retry(attempt)
+
+    async def _generate_batch(self, words: List[str]) -> Dict[str, str]:
+        """一次请求生成多个词语的解释，请求失败时返回空字典"""
+        start = time.perf_counter()
+        try:
+            reply = await self._limited_complete(build_batch_prompt(words), BATCH_TOKENS_PER_WORD * len(words),
+                                                 json_mode=True)
+        except RateLimitExceeded as e:
+            if isinstance(e, ProviderUnavailable):
+                LLM_CALL_SECONDS.observe(time.perf_counter() - start, provider=self.name, outcome="error")
+            raise
+        except Exception as e:
+            LLM_CALL_SECONDS.observe(time.perf_counter() - start, provider=self.name, outcome="error")
+            logger.warning("批量生成失败，改为逐个生成", extra={"provider": self.name, "count": len(words), "error": str(e)})
+            return {}
+        LLM_CALL_SECONDS.observe(time.perf_counter() - start, provider=self.name, outcome="ok")
+        log_payload(logger, "批量响应", reply, provider=self.name)
+        return parse_batch_reply(reply, words)
+
+    async def generate_interpretations(self, words: List[str], concurrency: int = 4) -> Dict[str, str]:
+        """
+        批量生成解释，返回 {词语: 解释}
+
+        每 batch_size 个词语打包成一次请求以分摊提示词开销和往返延迟；回复中缺失或格式错误的
+        词语再各自调用 generate_interpretation。仍然失败的词语不出现在结果中，由调用方兜底。
+        """
+        unique = list(dict.fromkeys(w for w in words if w))
+        results: Dict[str, str] = {}
+        size = self.batch_size
+        if size > 1:
+            chunks = [unique[i:i + size] for i in range(0, len(unique), size)]
+            async for parsed in map_unordered(self._generate_batch, chunks, concurrency):
+                results.update(parsed)
+            BATCH_WORDS.inc(len(results), provider=self.name, mode="packed")
+
+        missing = [w for w in unique if w not in results]
+        if missing:
+            if size > 1:
+                BATCH_WORDS.inc(len(missing), provider=self.name, mode="single")
+
+            async def single(word):
+                try:
+                    return word, await self.generate_interpretation(word)
+                except LLMError:
+                    return word, None
+
+            async for word, interpretation in map_unordered(single, missing, concurrency):
+                if interpretation is not None:
+                    results[word] = interpretation
+        return results
+
+    async def _stream_interpretation(self, word: str) -> AsyncIterator[str]:
+        """默认实现等待完整结果后一次性产出，支持流式接口的适配器应覆盖此方法"""
+        interpretation = await self._generate_interpretation(word)
+        if not interpretation or not interpretation.strip():
+            raise LLMError("空响应")
+        yield interpretation
+
+    async def aclose(self) -> None:
+        """释放适配器持有的连接等资源"""
         pass
 
+async def iterate_in_thread(make_iterator: Callable[[], Iterator[str]], executor=None) -> AsyncIterator[str]:
+    """在线程池中消费同步 SDK 的流式迭代器，逐项转交给事件循环"""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stopped = threading.Event()
+    finished = object()
+
+    def produce():
+        try:
+            for item in make_iterator():
+                if stopped.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, (finished, e))
+        else:
+            loop.call_soon_threadsafe(queue.put_nowait, (finished, None))
+
+    future = loop.run_in_executor(executor, produce)
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is finished:
+                if error is not None:
+                    raise error
+                break
+            yield item
+    finally:
+        # 消费方提前退出时通知生产线程停止读取
+        stopped.set()
+        if future.done():
+            future.result()
+
+async def iter_sse_data(response: "aiohttp.ClientResponse") -> AsyncIterator[str]:
+    """解析 Server-Sent Events 响应，逐个产出事件的 data 字段"""
+    data_lines = []
+    async for raw_line in response.content:
+        line = raw_line.decode('utf-8').rstrip('\r\n')
+        if not line:
+            if data_lines:
+                yield '\n'.join(data_lines)
+                data_lines = []
+        elif line.startswith('data:'):
+            data_lines.append(line[5:].lstrip(' '))
+    if data_lines:
+        yield '\n'.join(data_lines)
+
+class HTTPAdapter(LLMAdapter):
+    """直接通过 aiohttp 调用 HTTP 接口的适配器，整个进程共享一个长连接池"""
+
+    def __init__(self):
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        # 会话绑定在创建它的事件循环上，循环变化（如命令行多次 asyncio.run）时重建
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=HTTP_POOL_LIMIT,
+                ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+                keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=LLM_REQUEST_TIMEOUT)
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def aclose(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
 class OpenAIAdapter(LLMAdapter):
+    name = "openai"
+
     def __init__(self):
+        import httpx
+        import openai
+
         openai.api_key = os.getenv('OPENAI_API_KEY')
-        self.client = openai.AsyncOpenAI()
+        # 重试由 LLMAdapter 统一处理，关闭 SDK 自带的重试以免叠加
+        self.client = openai.AsyncOpenAI(
+            base_url=os.getenv('OPENAI_BASE_URL') or None,
+            timeout=LLM_REQUEST_TIMEOUT,
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=HTTP_POOL_LIMIT,
+                    max_keepalive_connections=HTTP_POOL_LIMIT,
+                    keepalive_expiry=HTTP_KEEPALIVE_TIMEOUT,
+                )
+            )
+        )
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+    async def _complete(self, prompt: str, max_tokens: int, json_mode: bool = False) -> str:
+        options = {"response_format": {"type": "json_object"}} if json_mode else {}
+        try:
+            response = await self.client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=max_tokens,
+                **options
+            )
+        except Exception as e:
+            error = provider_http_error(e)
+            if error is not None:
+                raise error from e
+            raise LLMError(str(e)) from e
+        return response.choices[0].message.content or ""
         
-    async def generate_interpretation(self, word: str) -> str:
+    async def _generate_interpretation(self, word: str) -> str:
         try:
             response = await self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[
-                    {"role": "system", "content": "你是一个擅长用批判性、机智幽默的方式解读中文词语的AI。你的风格类似于王尔德、鲁迅和骆永华的结合，善于使用隐喻和讽刺。请直接给出解释，不要加任何引号。"},
-                    {"role": "user", "content": f"请用一句话解释{word}这个词，要求：\n1. 批判性地解读这个词背后的社会现象\n2. 使用机智幽默的语言\n3. 可以使用隐喻和讽刺\n4. 长度在50字以内\n5. 直接给出解释，不要加任何引号"}
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": build_user_prompt(word)}
                 ]
             )
             return response.choices[0].message.content
         except Exception as e:
-            return f"抱歉，生成解释时出现错误：{str(e)}"
+            error = provider_http_error(e)
+            if error is not None:
+                raise error from e
+            raise LLMError(str(e)) from e
+
+    async def _stream_interpretation(self, word: str) -> AsyncIterator[str]:
+        try:
+            stream = await self.client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": build_user_prompt(word)}
+                ],
+                stream=True
+            )
+        except Exception as e:
+            error = provider_http_error(e)
+            if error is not None:
+                raise error from e
+            raise
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
 class ZhiPuAdapter(LLMAdapter):
+    name = "zhipuai"
+
     def __init__(self):
+        from zhipuai import ZhipuAI
+
         api_key = os.getenv('ZHIPUAI_API_KEY')
-        self.client = ZhipuAI(api_key=api_key)
+        self.client = ZhipuAI(api_key=api_key, base_url=os.getenv('ZHIPUAI_BASE_URL') or None,
+                              timeout=LLM_REQUEST_TIMEOUT, max_retries=0)
+        # 同步 SDK 在专用线程池中执行，不占用事件循环的默认线程池
+        self.executor = get_executor(self.name)
+
+    async def _complete(self, prompt: str, max_tokens: int, json_mode: bool = False) -> str:
+        loop = asyncio.get_running_loop()
+        try:
+            response = await loop.run_in_executor(
+                self.executor,
+                lambda: self.client.chat.completions.create(
+                    model="glm-4",
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=max_tokens
+                )
+            )
+        except Exception as e:
+            error = provider_http_error(e)
+            if error is not None:
+                raise error from e
+            raise LLMError(str(e)) from e
+        return response.choices[0].message.content or ""
         
-    async def generate_interpretation(self, word: str) -> str:
+    async def _generate_interpretation(self, word: str) -> str:
         try:
             loop = asyncio.get_running_loop()
             response = await loop.run_in_executor(
-                None,
+                self.executor,
                 lambda: self.client.chat.completions.create(
                     model="glm-4",
                     messages=[
-                        {"role": "system", "content": "你是一个擅长用批判性、机智幽默的方式解读中文词语的AI。你的风格类似于王尔德、鲁迅和骆永华的结合，善于使用隐喻和讽刺。请直接给出解释，不要加任何引号。"},
-                        {"role": "user", "content": f"请用一句话解释{word}这个词，要求：\n1. 批判性地解读这个词背后的社会现象\n2. 使用机智幽默的语言\n3. 可以使用隐喻和讽刺\n4. 长度在50字以内\n5. 直接给出解释，不要加任何引号"}
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": build_user_prompt(word)}
                     ]
                 )
             )
             return response.choices[0].message.content
         except Exception as e:
-            return f"抱歉，生成解释时出现错误：{str(e)}"
+            error = provider_http_error(e)
+            if error is not None:
+                raise error from e
+            raise LLMError(str(e)) from e
+
+    async def _stream_interpretation(self, word: str) -> AsyncIterator[str]:
+        def chunks():
+            response = self.client.chat.completions.create(
+                model="glm-4",
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": build_user_prompt(word)}
+                ],
+                stream=True
+            )
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+        try:
+            async for text in iterate_in_thread(chunks, self.executor):
+                yield text
+        except Exception as e:
+            error = provider_http_error(e)
+            if error is not None:
+                raise error from e
+            raise
+
+class QwenAdapter(HTTPAdapter):
+    name = "qwen"
 
-class QwenAdapter(LLMAdapter):
     def __init__(self):
+        super().__init__()
         self.api_key = os.getenv('QWEN_API_KEY')
-        self.url = "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation"
+        base_url = (os.getenv('QWEN_BASE_URL') or 'https://dashscope.aliyuncs.com/api/v1').rstrip('/')
+        self.url = f"{base_url}/services/aigc/text-generation/generation"
         
-    async def generate_interpretation(self, word: str) -> str:
-        try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "X-DashScope-SSE": "disable"
-            }
-            
-            data = {
-                "model": "qwen-max",
-                "input": {
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": "你是一个擅长用批判性、机智幽默的方式解读中文词语的AI。你的风格类似于王尔德、鲁迅和骆永华的结合，善于使用隐喻和讽刺。请直接给出解释，不要加任何引号。"
-                        },
-                        {
-                            "role": "user",
-                            "content": f"请用一句话解释{word}这个词，要求：\n1. 批判性地解读这个词背后的社会现象\n2. 使用机智幽默的语言\n3. 可以使用隐喻和讽刺\n4. 长度在50字以内\n5. 直接给出解释，不要加任何引号"
-                        }
-                    ]
-                },
-                "parameters": {
-                    "result_format": "message",
-                    "top_p": 0.8,
-                    "seed": 1234,
-                    "max_tokens": 100,
-                    "temperature": 0.8
-                }
+    def _build_request(self, prompt: str, stream: bool = False, max_tokens: int = 100):
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "X-DashScope-SSE": "enable" if stream else "disable"
+        }
+        
+        data = {
+            "model": "qwen-max",
+            "input": {
+                "messages": [
+                    {
+                        "role": "system",
+                        "content": SYSTEM_PROMPT
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ]
+            },
+            "parameters": {
+                "result_format": "message",
+                "top_p": 0.8,
+                "seed": 1234,
+                "max_tokens": max_tokens,
+                "temperature": 0.8,
+                # 流式模式下每个事件只包含新增的文本
+                "incremental_output": stream
             }
+        }
+        return headers, data
+
+    async def _complete(self, prompt: str, max_tokens: int, json_mode: bool = False) -> str:
+        headers, data = self._build_request(prompt, max_tokens=max_tokens)
+        session = self._get_session()
+        async with session.post(self.url, headers=headers, json=data) as response:
+            if response.status in RETRYABLE_STATUSES:
+                raise ProviderHTTPError(response.status, await response.text(),
+                                        parse_retry_after(response.headers.get('Retry-After')))
+            if response.status != 200:
+                raise LLMError(f"HTTP {response.status}: {await response.text()}")
+            output = (await response.json()).get("output") or {}
+        if output.get("choices"):
+            return output["choices"][0]["message"]["content"]
+        if "text" in output:
+            return output["text"]
+        raise LLMError("返回格式异常")
+
+    async def _generate_interpretation(self, word: str) -> str:
+        try:
+            headers, data = self._build_request(build_user_prompt(word))
+            log_payload(logger, "LLM 请求", data, provider=self.name, url=self.url)
             
-            print(f"Qwen request URL: {self.url}")
-            print(f"Qwen request headers: {headers}")
-            print(f"Qwen request data: {json.dumps(data, ensure_ascii=False, indent=2)}")
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.url, headers=headers, json=data) as response:
-                    result = await response.json()
-                    print(f"Qwen response: {json.dumps(result, ensure_ascii=False, indent=2)}")
-                    
-                    if response.status != 200:
-                        return f"抱歉，API 调用失败：HTTP {response.status} - {result.get('message', '未知错误')}"
-                    
-                    if "output" in result:
-                        if "text" in result["output"]:
-                            return result["output"]["text"]
-                        elif "choices" in result["output"] and len(result["output"]["choices"]) > 0:
-                            return result["output"]["choices"][0]["message"]["content"]
-                    return f"抱歉，返回格式异常：{json.dumps(result, ensure_ascii=False)}"
+            session = self._get_session()
+            async with session.post(self.url, headers=headers, json=data) as response:
+                if response.status in RETRYABLE_STATUSES:
+                    raise ProviderHTTPError(response.status, await response.text(),
+                                            parse_retry_after(response.headers.get('Retry-After')))
+                result = await response.json()
+                log_payload(logger, "LLM 响应", result, provider=self.name)
+                
+                if response.status != 200:
+                    raise LLMError(f"HTTP {response.status} - {result.get('message', '未知错误')}")
+                
+                if "output" in result:
+                    if "text" in result["output"]:
+                        return result["output"]["text"]
+                    elif "choices" in result["output"] and len(result["output"]["choices"]) > 0:
+                        return result["output"]["choices"][0]["message"]["content"]
+                raise LLMError(f"返回格式异常：{json.dumps(result, ensure_ascii=False)[:200]}")
+        except LLMError:
+            raise
         except Exception as e:
-            import traceback
-            print(f"Qwen error: {str(e)}")
-            print(f"Traceback: {traceback.format_exc()}")
-            return f"抱歉，生成解释时出现错误：{str(e)}"
+            raise LLMError(str(e)) from e
+
+    async def _stream_interpretation(self, word: str) -> AsyncIterator[str]:
+        headers, data = self._build_request(build_user_prompt(word), stream=True)
+        session = self._get_session()
+        async with session.post(self.url, headers=headers, json=data) as response:
+            if response.status in RETRYABLE_STATUSES:
+                raise ProviderHTTPError(response.status, await response.text(),
+                                        parse_retry_after(response.headers.get('Retry-After')))
+            if response.status != 200:
+                raise LLMError(f"HTTP {response.status}: {await response.text()}")
+            async for payload in iter_sse_data(response):
+                event = json.loads(payload)
+                output = event.get("output") or {}
+                if output.get("choices"):
+                    text = output["choices"][0]["message"]["content"]
+                else:
+                    text = output.get("text")
+                if text:
+                    yield text
 
 class GeminiAdapter(LLMAdapter):
+    name = "gemini"
+
     def __init__(self):
+        import google.generativeai as genai
+
         genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
         self.model = genai.GenerativeModel('gemini-pro')
+        self.executor = get_executor(self.name)
+
+    async def _complete(self, prompt: str, max_tokens: int, json_mode: bool = False) -> str:
+        loop = asyncio.get_running_loop()
+        try:
+            response = await loop.run_in_executor(
+                self.executor,
+                lambda: self.model.generate_content(
+                    f"{SYSTEM_PROMPT}\n\n{prompt}",
+                    generation_config={"max_output_tokens": max_tokens},
+                    request_options={"timeout": LLM_REQUEST_TIMEOUT}
+                )
+            )
+            return response.text
+        except Exception as e:
+            error = provider_http_error(e)
+            if error is not None:
+                raise error from e
+            raise LLMError(str(e)) from e
         
-    async def generate_interpretation(self, word: str) -> str:
+    async def _generate_interpretation(self, word: str) -> str:
         try:
             loop = asyncio.get_running_loop()
-            chat = self.model.start_chat(history=[])
+            # 单轮生成直接调用 generate_content，不需要为每个词语创建对话会话
             response = await loop.run_in_executor(
-                None,
-                lambda: chat.send_message(
-                    f"""你是一个擅长用批判性、机智幽默的方式解读中文词语的AI。你的风格类似于王尔德、鲁迅和骆永华的结合，善于使用隐喻和讽刺。请直接给出解释，不要加任何引号。
-                    
-                    请用一句话解释{word}这个词，要求：
-                    1. 批判性地解读这个词背后的社会现象
-                    2. 使用机智幽默的语言
-                    3. 可以使用隐喻和讽刺
-                    4. 长度在50字以内
-                    5. 直接给出解释，不要加任何引号"""
+                self.executor,
+                lambda: self.model.generate_content(
+                    f"{SYSTEM_PROMPT}\n\n{build_user_prompt(word)}",
+                    request_options={"timeout": LLM_REQUEST_TIMEOUT}
                 )
             )
             return response.text
         except Exception as e:
-            return f"抱歉，生成解释时出现错误：{str(e)}"
+            error = provider_http_error(e)
+            if error is not None:
+                raise error from e
+            raise LLMError(str(e)) from e
+
+    async def _stream_interpretation(self, word: str) -> AsyncIterator[str]:
+        def chunks():
+            response = self.model.generate_content(
+                f"{SYSTEM_PROMPT}\n\n{build_user_prompt(word)}",
+                stream=True,
+                request_options={"timeout": LLM_REQUEST_TIMEOUT}
+            )
+            for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+
+        try:
+            async for text in iterate_in_thread(chunks, self.executor):
+                yield text
+        except Exception as e:
+            error = provider_http_error(e)
+            if error is not None:
+                raise error from e
+            raise
+
+class DeepSeekAdapter(HTTPAdapter):
+    name = "deepseek"
 
-class DeepSeekAdapter(LLMAdapter):
     def __init__(self):
+        super().__init__()
         self.api_key = os.getenv('DEEPSEEK_API_KEY')
         if not self.api_key:
-            print("警告: 未找到 DEEPSEEK_API_KEY 环境变量")
-        self.base_url = "https://api.deepseek.com/v1/chat/completions"
-        print(f"\nDeepSeek 初始化:")
-        print(f"API Key 前8位: {self.api_key[:8] if self.api_key else 'None'}")
-        print(f"API URL: {self.base_url}")
-        
-    async def generate_interpretation(self, word: str) -> str:
+            logger.warning("未找到 DEEPSEEK_API_KEY 环境变量")
+        base_url = (os.getenv('DEEPSEEK_BASE_URL') or 'https://api.deepseek.com/v1').rstrip('/')
+        self.base_url = f"{base_url}/chat/completions"
+
+    def _build_request(self, prompt: str, stream: bool = False, max_tokens: int = 100, json_mode: bool = False):
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream" if stream else "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+
+        data = {
+            "model": "deepseek-chat",  # 使用基础模型
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.7,  # 降低温度
+            "max_tokens": max_tokens,
+            "stream": stream
+        }
+        if json_mode:
+            data["response_format"] = {"type": "json_object"}
+        return headers, data
+
+    async def _complete(self, prompt: str, max_tokens: int, json_mode: bool = False) -> str:
+        if not self.api_key:
+            raise LLMError("未设置 DEEPSEEK_API_KEY 环境变量")
+        headers, data = self._build_request(prompt, max_tokens=max_tokens, json_mode=json_mode)
+        session = self._get_session()
+        async with session.post(self.base_url, headers=headers, json=data) as response:
+            if response.status in RETRYABLE_STATUSES:
+                raise ProviderHTTPError(response.status, await response.text(),
+                                        parse_retry_after(response.headers.get('Retry-After')))
+            if response.status != 200:
+                raise LLMError(f"HTTP {response.status}: {await response.text()}")
+            result = await response.json(content_type=None)
+        if not result.get("choices"):
+            raise LLMError("返回格式异常")
+        return result["choices"][0]["message"]["content"] or ""
+
+    async def _generate_interpretation(self, word: str) -> str:
         try:
-            print(f"\nDeepSeek 开始处理词语: {word}")
-            
             # 检查 API Key
             if not self.api_key:
                 raise ValueError("未设置 DEEPSEEK_API_KEY 环境变量")
             
-            headers = {
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            print("请求头:", {k: v if k != 'Authorization' else v[:20] + '...' for k, v in headers.items()})
-
-            data = {
-                "model": "deepseek-chat",  # 使用基础模型
-                "messages": [
-                    {"role": "system", "content": "你是一个擅长用批判性、机智幽默的方式解读中文词语的AI。你的风格类似于王尔德、鲁迅和骆永华的结合，善于使用隐喻和讽刺。请直接给出解释，不要加任何引号。"},
-                    {"role": "user", "content": f"请用一句话解释{word}这个词，要求：\n1. 批判性地解读这个词背后的社会现象\n2. 使用机智幽默的语言\n3. 可以使用隐喻和讽刺\n4. 长度在50字以内\n5. 直接给出解释，不要加任何引号"}
-                ],
-                "temperature": 0.7,  # 降低温度
-                "max_tokens": 100,
-                "stream": False
-            }
-            
-            print("请求数据:", json.dumps(data, ensure_ascii=False, indent=2))
+            headers, data = self._build_request(build_user_prompt(word))
+            log_payload(logger, "LLM 请求", data, provider=self.name, url=self.base_url)
             
-            print("\n开始发送请求...")
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.base_url, headers=headers, json=data) as response:
-                    status = response.status
-                    print(f"响应状态码: {status}")
-                    
-                    response_text = await response.text()
-                    print(f"原始响应: {response_text}")
-                    
-                    if status == 402:
-                        print("API 调用失败: 付费相关错误，请检查 API Key 的额度和状态")
-                        return "抱歉，API 额度不足或未授权，请联系管理员处理"
-                    elif status != 200:
-                        print(f"API 调用失败: HTTP {status}")
-                        try:
-                            error_json = json.loads(response_text)
-                            error_msg = error_json.get('error_msg', '未知错误')
-                            print(f"错误信息: {error_msg}")
-                            return f"抱歉，API调用失败：{error_msg}"
-                        except:
-                            return f"抱歉，API调用失败：HTTP {status}"
-                    
+            session = self._get_session()
+            async with session.post(self.base_url, headers=headers, json=data) as response:
+                status = response.status
+                response_text = await response.text()
+                log_payload(logger, "LLM 响应", response_text, provider=self.name, status=status)
+                
+                if status in RETRYABLE_STATUSES:
+                    raise ProviderHTTPError(status, response_text[:200],
+                                            parse_retry_after(response.headers.get('Retry-After')))
+                elif status == 402:
+                    logger.error("付费相关错误，请检查 API Key 的额度和状态", extra={"provider": self.name, "status": status})
+                    raise LLMError("API 额度不足或未授权（HTTP 402）")
+                elif status != 200:
                     try:
-                        result = json.loads(response_text)
-                        print("解析后的响应:", json.dumps(result, ensure_ascii=False, indent=2))
-                        
-                        if "choices" in result and len(result["choices"]) > 0:
-                            content = result["choices"][0]["message"]["content"].strip()
-                            print(f"生成的内容: {content}")
-                            return content
-                        else:
-                            print("响应格式异常")
-                            return f"抱歉，API返回格式异常：{result.get('message', '未知错误')}"
-                    except json.JSONDecodeError as e:
-                        print(f"JSON 解析错误: {e}")
-                        return f"API返回数据解析失败：{response_text[:100]}"
-                        
+                        error_msg = json.loads(response_text).get('error_msg', '未知错误')
+                    except (json.JSONDecodeError, AttributeError):
+                        error_msg = '未知错误'
+                    raise LLMError(f"HTTP {status}：{error_msg}")
+                
+                try:
+                    result = json.loads(response_text)
+                except json.JSONDecodeError as e:
+                    # 如网关返回的 HTML 错误页
+                    raise LLMError(f"返回数据解析失败：{response_text[:100]}") from e
+                if isinstance(result, dict) and result.get("choices"):
+                    return result["choices"][0]["message"]["content"].strip()
+                raise LLMError("返回格式异常")
+                    
+        except LLMError:
+            raise
         except Exception as e:
-            import traceback
-            print(f"\nDeepSeek 错误详情:")
-            print(f"错误类型: {type(e)}")
-            print(f"错误信息: {str(e)}")
-            print(f"错误堆栈:\n{traceback.format_exc()}")
-            return f"抱歉，生成解释时出现错误：{str(e)}"
+            raise LLMError(str(e)) from e
 
-def get_llm_adapter(model_name: str) -> Optional[LLMAdapter]:
-    adapters = {
-        'openai': OpenAIAdapter,
-        'zhipuai': ZhiPuAdapter,
-        'qwen': QwenAdapter,
-        'gemini': GeminiAdapter,
-        'deepseek': DeepSeekAdapter,
-    }
-    
-    adapter_class = adapters.get(model_name.lower())
-    if adapter_class:
-        return adapter_class()
+    async def _stream_interpretation(self, word: str) -> AsyncIterator[str]:
+        if not self.api_key:
+            raise LLMError("未设置 DEEPSEEK_API_KEY 环境变量")
+        headers, data = self._build_request(build_user_prompt(word), stream=True)
+        session = self._get_session()
+        async with session.post(self.base_url, headers=headers, json=data) as response:
+            if response.status in RETRYABLE_STATUSES:
+                raise ProviderHTTPError(response.status, await response.text(),
+                                        parse_retry_after(response.headers.get('Retry-After')))
+            if response.status != 200:
+                raise LLMError(f"HTTP {response.status}: {await response.text()}")
+            async for payload in iter_sse_data(response):
+                if payload == "[DONE]":
+                    break
+                event = json.loads(payload)
+                if event.get("choices"):
+                    text = event["choices"][0].get("delta", {}).get("content")
+                    if text:
+                        yield text
+
+# 各提供商对应的 API Key 环境变量，auto 模式只在配置了 Key 的提供商之间路由
+PROVIDER_API_KEYS = {
+    'openai': 'OPENAI_API_KEY',
+    'zhipuai': 'ZHIPUAI_API_KEY',
+    'qwen': 'QWEN_API_KEY',
+    'gemini': 'GEMINI_API_KEY',
+    'deepseek': 'DEEPSEEK_API_KEY',
+}
+
+class RoutingAdapter(LLMAdapter):
+    """auto 模式：在多个提供商之间按延迟路由，带对冲请求、截止时间和故障转移"""
+    name = "auto"
+    rate_limited = False
+
+    def __init__(self):
+        configured = os.getenv('ROUTER_PROVIDERS')
+        if configured:
+            self.providers = [p.strip().lower() for p in configured.split(',') if p.strip()]
+        else:
+            self.providers = [name for name, env in PROVIDER_API_KEYS.items() if os.getenv(env)]
+        self.router = ProviderRouter.from_env()
+
+    async def _route(self, fn: Callable[[LLMAdapter], Awaitable[str]]) -> str:
+        """按路由顺序对各提供商的适配器调用 fn，全部失败时抛出 LLMError（都被限流时抛出 RateLimitExceeded）"""
+        try:
+            return await self.router.call(self.providers, lambda name: fn(registry.get(name)))
+        except RoutingError as e:
+            raise _backpressure(e.failures) or LLMError(str(e)) from e
+
+    async def _generate_interpretation(self, word: str) -> str:
+        return await self._route(lambda adapter: adapter.generate_interpretation(word))
+
+    async def _complete(self, prompt: str, max_tokens: int, json_mode: bool = False) -> str:
+        # 每个提供商各自限流和重试；路由层不再重试，失败时转移到下一个提供商
+        return await self._route(lambda adapter: adapter._limited_complete(prompt, max_tokens, json_mode))
+
+    async def _stream_interpretation(self, word: str) -> AsyncIterator[str]:
+        # 流式输出一旦开始就无法切换提供商，因此只在首个分片到达前做故障转移
+        loop = asyncio.get_running_loop()
+        expires_at = loop.time() + self.router.deadline
+        errors = []
+        failures = []
+        for name in self.router.rank(self.providers):
+            stream = registry.get(name).stream_interpretation(word).__aiter__()
+            start = time.perf_counter()
+            try:
+                first = await asyncio.wait_for(stream.__anext__(), max(0.0, expires_at - loop.time()))
+            except StopAsyncIteration:
+                self.router.record_failure(name)
+                errors.append(f"{name}: 空响应")
+                continue
+            except Exception as e:
+                self.router.record_failure(name)
+                errors.append(f"{name}: {str(e) or type(e).__name__}")
+                failures.append(e)
+                await stream.aclose()
+                continue
+            yield first
+            async for delta in stream:
+                yield delta
+            self.router.stats(name).record_success(time.perf_counter() - start)
+            return
+        raise _backpressure(failures) or LLMError("所有提供商均失败：" + "；".join(errors))
+
+def _backpressure(failures: List[BaseException]) -> Optional[RateLimitExceeded]:
+    """所有提供商都因限流失败时返回等待最短的那个，交给接口层返回 503；否则返回 None"""
+    if failures and all(isinstance(e, RateLimitExceeded) for e in failures):
+        return min(failures, key=lambda e: e.retry_after)
     return None
+
+ADAPTERS = {
+    'openai': OpenAIAdapter,
+    'zhipuai': ZhiPuAdapter,
+    'qwen': QwenAdapter,
+    'gemini': GeminiAdapter,
+    'deepseek': DeepSeekAdapter,
+    'auto': RoutingAdapter,
+}
+
+class AdapterRegistry:
+    """每个进程内每种适配器只构建一次，SDK 客户端和连接池在请求之间复用"""
+
+    def __init__(self, factories=ADAPTERS):
+        self._factories = factories
+        self._adapters = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str) -> Optional[LLMAdapter]:
+        name = model_name.lower()
+        adapter = self._adapters.get(name)
+        if adapter is not None:
+            return adapter
+        adapter_class = self._factories.get(name)
+        if not adapter_class:
+            return None
+        with self._lock:
+            adapter = self._adapters.get(name)
+            if adapter is None:
+                with STAGE_SECONDS.time(stage="adapter_init"):
+                    adapter = adapter_class()
+                self._adapters[name] = adapter
+        return adapter
+
+    def peek(self, model_name: str) -> Optional[LLMAdapter]:
+        """返回已构建的适配器，不触发构建"""
+        return self._adapters.get(model_name.lower())
+
+    async def aclose(self) -> None:
+        """关闭所有已构建适配器的连接池和同步 SDK 线程池"""
+        with self._lock:
+            adapters = list(self._adapters.values())
+            self._adapters.clear()
+        for adapter in adapters:
+            try:
+                await adapter.aclose()
+            except Exception as e:
+                logger.warning("关闭适配器失败", extra={"provider": adapter.name, "error": str(e)})
+        shutdown_executors()
+
+registry = AdapterRegistry()
+
+def get_llm_adapter(model_name: str) -> Optional[LLMAdapter]:
+    return registry.get(model_name)
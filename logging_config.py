@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+日志配置
+
+日志记录只把记录放进内存队列，由后台线程写到标准输出，事件循环不会因终端或
+管道写入而阻塞。级别由 LOG_LEVEL 控制；请求/响应报文较大，只有在 LOG_PAYLOADS=1
+且 DEBUG 级别启用时才会输出。
+
+日志是结构化的：词语、提供商、耗时等上下文通过 extra= 作为字段传入，不拼进消息文本。
+LOG_FORMAT=logfmt（默认）每行输出 key=value 对，LOG_FORMAT=json 每行输出一个 JSON 对象：
+
+    logger.info("开始处理请求", extra={"word": word, "model": model})
+    ts=2024-01-01T12:00:00.123 level=INFO logger=app msg=开始处理请求 word=内卷 model=deepseek
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+
+# logfmt 或 json
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'logfmt').lower()
+LOG_PAYLOADS = os.getenv('LOG_PAYLOADS', '0') == '1'
+
+_listener = None
+
+# LogRecord 自带的属性，其余属性都是通过 extra= 传入的字段
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+
+def _logfmt_value(value) -> str:
+    if isinstance(value, float):
+        value = f'{value:.6g}'
+    else:
+        value = str(value)
+    if not value or any(ch in value for ch in ' ="\\\n\t'):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+class StructuredFormatter(logging.Formatter):
+    """把日志记录格式化为 logfmt 或 JSON，extra= 传入的字段原样输出"""
+
+    def __init__(self, style: str = 'logfmt'):
+        super().__init__()
+        self.json = style == 'json'
+
+    def fields(self, record: logging.LogRecord) -> dict:
+        fields = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                fields[key] = value
+        if record.exc_info:
+            fields['exc'] = self.formatException(record.exc_info)
+        return fields
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = self.fields(record)
+        if self.json:
+            return json.dumps(fields, ensure_ascii=False, default=str)
+        return ' '.join(f'{key}={_logfmt_value(value)}' for key, value in fields.items())
+
+
+def setup_logging(level: str = None) -> None:
+    """配置根日志器，重复调用不会重复添加处理器"""
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(StructuredFormatter(LOG_FORMAT))
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel((level or os.getenv('LOG_LEVEL', 'INFO')).upper())
+
+
+def use_root_logging(config, access_log: bool = False) -> None:
+    """
+    让 hypercorn 的日志经由根日志器输出
+
+    hypercorn 默认给 hypercorn.error 挂自己的 StreamHandler 且仍向上传播，
+    与根日志器的队列处理器叠加后每行会输出两次。传入日志器对象时 hypercorn 直接使用它，
+    不再添加处理器。
+    """
+    config.errorlog = logging.getLogger('hypercorn.error')
+    config.accesslog = logging.getLogger('hypercorn.access') if access_log else None
+
+
+def log_payload(logger: logging.Logger, message: str, payload, **fields) -> None:
+    """在 LOG_PAYLOADS=1 且启用 DEBUG 时输出请求/响应报文，否则不做序列化"""
+    if LOG_PAYLOADS and logger.isEnabledFor(logging.DEBUG):
+        if not isinstance(payload, str):
+            payload = json.dumps(payload, ensure_ascii=False)
+        logger.debug(message, extra={'payload': payload, **fields})
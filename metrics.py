@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+进程内指标：计数器、直方图和回调采集，按 Prometheus 文本格式导出
+
+不依赖 prometheus_client。所有指标注册在模块级 REGISTRY 上，
+/metrics 接口直接返回 REGISTRY.render() 的结果。
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# 默认延迟分桶（秒），覆盖从毫秒级的本地渲染到数十秒的 LLM 调用
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签 -> [各分桶计数（最后一个为 +Inf）..., 总和]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """记录代码块耗时（秒），无论是否抛出异常"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ('le',), key + (_format_value(bound),))
+                lines.append(f'{self.name}_bucket{labels} {_format_value(cumulative)}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(state[-1])}')
+            lines.append(f'{self.name}_count{labels} {_format_value(cumulative)}')
+        return lines
+
+
+class Callback(_Metric):
+    """在导出时调用 fn 采集当前值，fn 返回 {标签值元组: 数值}"""
+
+    def __init__(self, name, documentation, labelnames, fn: Callable[[], Dict[LabelValues, float]],
+                 type: str = 'gauge'):
+        super().__init__(name, documentation, labelnames)
+        self.type = type
+        self._fn = fn
+
+    def collect(self) -> List[str]:
+        try:
+            values = self._fn()
+        except Exception:
+            return []
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                for key, value in sorted(values.items()) if value is not None]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, labelnames, fn, type='gauge') -> Callback:
+        return self.register(Callback(name, documentation, labelnames, fn, type))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# 各阶段耗时：adapter_init、pinyin、svg_render、rasterize（端到端总耗时见 wordnew_request_seconds）
+STAGE_SECONDS = REGISTRY.histogram(
+    'wordnew_stage_seconds', '各处理阶段耗时（秒）', ('stage',))
+# 每个提供商的 LLM 调用耗时，outcome 为 ok 或 error
+LLM_CALL_SECONDS = REGISTRY.histogram(
+    'wordnew_llm_call_seconds', 'LLM 调用耗时（秒）', ('provider', 'outcome'))
+# 各接口端到端耗时
+REQUEST_SECONDS = REGISTRY.histogram(
+    'wordnew_request_seconds', 'HTTP 接口端到端耗时（秒）', ('endpoint', 'status'))
+ERRORS = REGISTRY.counter(
+    'wordnew_errors_total', '按阶段统计的错误数', ('stage',))
+FALLBACKS = REGISTRY.counter(
+    'wordnew_fallback_interpretations_total', 'LLM 不可用或失败时使用预置/兜底解释的次数', ('provider',))
+LLM_RETRIES = REGISTRY.counter(
+    'wordnew_llm_retries_total', '提供商返回 429/5xx 后的重试次数', ('provider',))
+RATE_LIMITED = REGISTRY.counter(
+    'wordnew_rate_limited_total', '本地限流拒绝的请求数', ('provider',))
+BATCH_WORDS = REGISTRY.counter(
+    'wordnew_batch_words_total', '批量生成的词语数：packed 为打包请求中成功解析，single 为单独重试', ('provider', 'mode'))
+LEXICON_HITS = REGISTRY.counter(
+    'wordnew_lexicon_hits_total', '词库中有预置解释、未调用 LLM 的请求数', ('provider',))
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+同步 SDK 专用的线程池
+
+智谱和 Gemini 的 SDK 是同步阻塞的。如果它们共用事件循环的默认线程池，
+一批慢请求会占满线程，拼音预加载等其他后台任务只能排队等待。这里每个提供商
+各有一个独立线程池，线程数由 <PROVIDER>_EXECUTOR_WORKERS 配置，并统计排队中和
+运行中的任务数。限流器的最大在途请求数限制了提交量，所以排队长度也是有上限的。
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict
+
+
+class ProviderExecutor(ThreadPoolExecutor):
+    def __init__(self, provider: str, max_workers: int):
+        super().__init__(max_workers=max_workers, thread_name_prefix=f"llm-{provider}")
+        self.provider = provider
+        self.max_workers = max_workers
+        self.queued = 0
+        self.running = 0
+        self._counter_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, provider: str, default_workers: int = 16) -> "ProviderExecutor":
+        workers = os.getenv(f"{provider.upper()}_EXECUTOR_WORKERS") or os.getenv("LLM_EXECUTOR_WORKERS")
+        return cls(provider, int(workers) if workers else default_workers)
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        started = False
+
+        def run():
+            nonlocal started
+            with self._counter_lock:
+                started = True
+                self.queued -= 1
+                self.running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._counter_lock:
+                    self.running -= 1
+
+        def forget_cancelled(_future):
+            # 排队中被取消（如关闭时 cancel_futures）的任务不会执行 run，在这里扣除
+            with self._counter_lock:
+                if not started:
+                    self.queued -= 1
+
+        with self._counter_lock:
+            self.queued += 1
+        try:
+            future = super().submit(run)
+        except BaseException:
+            with self._counter_lock:
+                self.queued -= 1
+            raise
+        future.add_done_callback(forget_cancelled)
+        return future
+
+
+_executors: Dict[str, ProviderExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(provider: str) -> ProviderExecutor:
+    """返回提供商专用线程池，同一提供商在进程内共享一个"""
+    executor = _executors.get(provider)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(provider)
+            if executor is None:
+                executor = _executors[provider] = ProviderExecutor.from_env(provider)
+    return executor
+
+
+def executors() -> Dict[str, ProviderExecutor]:
+    """当前已创建的线程池，供指标采集使用"""
+    return dict(_executors)
+
+
+def shutdown_executors() -> None:
+    """关闭所有线程池，尚未开始的任务直接取消"""
+    with _executors_lock:
+        pool = list(_executors.values())
+        _executors.clear()
+    for executor in pool:
+        executor.shutdown(wait=False, cancel_futures=True)
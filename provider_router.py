@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按延迟选择提供商的路由器：EWMA 延迟/错误率统计、对冲请求、端到端截止时间和故障转移
+
+请求优先发给最快的健康提供商；若在该提供商 p95 延迟内仍未返回，再向下一个提供商
+发出对冲请求，取先成功的结果并取消其余请求。失败时立即转移到下一个提供商，
+整个过程受截止时间约束。
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class RoutingError(Exception):
+    """所有提供商都失败或超出截止时间，failures 为各提供商抛出的异常（不含超时）"""
+
+    def __init__(self, message: str, failures: Optional[List[BaseException]] = None):
+        super().__init__(message)
+        self.failures = failures or []
+
+
+class ProviderStats:
+    def __init__(self, alpha: float = 0.2, window: int = 200):
+        self.alpha = alpha
+        self.ewma_latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.unhealthy_until = 0.0
+        self._latencies = deque(maxlen=window)
+
+    def record_success(self, latency: float) -> None:
+        self._record_latency(latency)
+        self.error_rate *= 1 - self.alpha
+
+    def record_cancelled(self, elapsed: float) -> None:
+        """
+        对冲落败被取消的请求：实际延迟至少为 elapsed，作为延迟下界计入样本
+
+        否则总比对冲延迟慢的提供商永远没有样本，一直排在最前，每个请求都要白等对冲延迟。
+        elapsed 不超过当前 EWMA 时不提供新信息，不计入。
+        """
+        if self.ewma_latency is None or elapsed > self.ewma_latency:
+            self._record_latency(elapsed)
+
+    def _record_latency(self, latency: float) -> None:
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency += self.alpha * (latency - self.ewma_latency)
+        self._latencies.append(latency)
+
+    def record_failure(self) -> None:
+        self.error_rate += self.alpha * (1 - self.error_rate)
+
+    def p95(self, min_samples: int) -> Optional[float]:
+        if len(self._latencies) < min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        return {
+            "ewma_latency": self.ewma_latency,
+            "error_rate": self.error_rate,
+            "healthy": time.monotonic() >= self.unhealthy_until,
+        }
+
+
+class ProviderRouter:
+    def __init__(self, deadline: float = 20.0, default_hedge_delay: float = 3.0, min_hedge_delay: float = 0.2,
+                 max_error_rate: float = 0.5, cooldown: float = 30.0, min_samples: int = 20):
+        self.deadline = deadline
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self.min_samples = min_samples
+        self._stats: Dict[str, ProviderStats] = {}
+
+    @classmethod
+    def from_env(cls) -> "ProviderRouter":
+        return cls(
+            deadline=float(os.getenv("ROUTER_DEADLINE", 20.0)),
+            default_hedge_delay=float(os.getenv("ROUTER_HEDGE_DELAY", 3.0)),
+            min_hedge_delay=float(os.getenv("ROUTER_MIN_HEDGE_DELAY", 0.2)),
+            max_error_rate=float(os.getenv("ROUTER_MAX_ERROR_RATE", 0.5)),
+            cooldown=float(os.getenv("ROUTER_COOLDOWN", 30.0)),
+        )
+
+    def stats(self, name: str) -> ProviderStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = ProviderStats()
+        return stats
+
+    def snapshot(self) -> Dict[str, Dict[str, Optional[float]]]:
+        return {name: stats.snapshot() for name, stats in self._stats.items()}
+
+    def rank(self, names: Iterable[str]) -> List[str]:
+        """健康的提供商按 EWMA 延迟排序在前（没有样本的优先试探），熔断中的排在最后兜底"""
+        now = time.monotonic()
+
+        def key(name):
+            stats = self.stats(name)
+            latency = stats.ewma_latency if stats.ewma_latency is not None else 0.0
+            return (stats.unhealthy_until > now, latency)
+
+        return sorted(names, key=key)
+
+    def hedge_delay(self, name: str) -> float:
+        p95 = self.stats(name).p95(self.min_samples)
+        if p95 is None:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, p95)
+
+    def record_failure(self, name: str) -> None:
+        stats = self.stats(name)
+        stats.record_failure()
+        if stats.error_rate > self.max_error_rate:
+            stats.unhealthy_until = time.monotonic() + self.cooldown
+
+    async def call(self, names: Iterable[str], fn: Callable[[str], Awaitable[T]],
+                   deadline: Optional[float] = None) -> T:
+        """
+        依次向提供商发起 fn(name)，返回第一个成功结果
+
+        fn 抛出异常视为该提供商失败。最多同时有两个请求在途（主请求和一个对冲请求）。
+        """
+        order = self.rank(names)
+        if not order:
+            raise RoutingError("没有可用的提供商")
+
+        loop = asyncio.get_running_loop()
+        expires_at = loop.time() + (deadline if deadline is not None else self.deadline)
+        remaining = iter(order)
+        pending: Dict[asyncio.Future, str] = {}
+        started: Dict[asyncio.Future, float] = {}
+        errors: List[str] = []
+        failures: List[BaseException] = []
+
+        async def timed(name):
+            start = time.perf_counter()
+            result = await fn(name)
+            self.stats(name).record_success(time.perf_counter() - start)
+            return result
+
+        def launch() -> Optional[str]:
+            name = next(remaining, None)
+            if name is not None:
+                task = asyncio.ensure_future(timed(name))
+                pending[task] = name
+                started[task] = time.perf_counter()
+            return name
+
+        try:
+            current = launch()
+            hedged = False
+            while pending:
+                timeout = expires_at - loop.time()
+                if timeout <= 0:
+                    for task, name in pending.items():
+                        task.cancel()
+                        self.record_failure(name)
+                        errors.append(f"{name}: 超时")
+                    pending.clear()
+                    break
+                hedge_pending = not hedged and len(pending) == 1
+                if hedge_pending:
+                    timeout = min(timeout, self.hedge_delay(current))
+
+                done, _ = await asyncio.wait(list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if hedge_pending and loop.time() < expires_at:
+                        # 主请求超过 p95 仍未返回，向下一个提供商发出对冲请求
+                        hedged = True
+                        current = launch() or current
+                    continue
+
+                for task in done:
+                    name = pending.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    self.record_failure(name)
+                    errors.append(f"{name}: {task.exception()}")
+                    failures.append(task.exception())
+                    # 失败后立即转移到下一个提供商
+                    current = launch() or current
+        finally:
+            # 其余请求在对冲中落败（或调用方取消），按已耗时记录延迟下界
+            now = time.perf_counter()
+            for task, name in pending.items():
+                task.cancel()
+                self.stats(name).record_cancelled(now - started[task])
+
+        raise RoutingError("所有提供商均失败：" + "；".join(errors), failures)
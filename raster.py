@@ -0,0 +1,400 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+卡片栅格化：把 SVG 卡片导出为 PNG/WebP
+
+栅格化在独立的进程池中执行，不占用事件循环；每个工作进程启动时加载一次字体，
+之后的渲染直接复用。两种后端：
+  - cairosvg：完整的 SVG 渲染，需要系统安装 libcairo
+  - pillow：只支持卡片模板用到的 rect、line、text 元素，字体由 RASTER_FONT_PATH
+    指定（需要包含中文字形，未设置时在常见位置查找 Noto Sans CJK 等字体）。
+    找不到字体或字体不含中文字形时 pillow 后端不可用，不会输出满是方框的图片
+RASTER_BACKEND=auto 时优先使用 cairosvg，不可用时使用 pillow。WebP 编码需要 Pillow。
+cairosvg 和 Pillow 都是可选依赖。
+
+栅格结果按 (渲染器, SVG 内容哈希, 格式, 缩放倍数) 缓存：进程内 LRU 之下是工作进程共享的
+SQLite 持久层，同一张卡片的每种尺寸只栅格化一次。渲染器包含后端和字体的标识，
+更换后端或字体后不会读到旧的结果。
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import shared_db
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {"png": "image/png", "webp": "image/webp"}
+# 允许的缩放倍数（逗号分隔），限制每张卡片的缓存条目数
+RASTER_SCALES = tuple(float(s) for s in os.getenv("RASTER_SCALES", "1,1.5,2,3,4").split(",") if s.strip())
+RASTER_WEBP_QUALITY = int(os.getenv("RASTER_WEBP_QUALITY", 90))
+DEFAULT_RASTER_CACHE_PATH = ".cache/rasters.sqlite3"
+
+# RASTER_FONT_PATH 未设置时依次查找的中文字体
+_FONT_CANDIDATES = (
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/System/Library/Fonts/PingFang.ttc",
+    "C:\\Windows\\Fonts\\msyh.ttc",
+)
+
+NO_BACKEND = "没有可用的栅格化后端，请安装 cairosvg，或安装 Pillow 并用 RASTER_FONT_PATH 指定中文字体"
+# 字体中一定没有的字符，用来识别缺字时绘制的替代字形
+_MISSING_GLYPH = "\U0010FFFD"
+
+# 渲染进程内的状态，由 init_worker 设置
+_backend: Optional[str] = None
+_cairosvg = None
+_font_data: Optional[bytes] = None
+
+
+class RasterUnavailable(RuntimeError):
+    """没有能正确显示中文的栅格化后端，或渲染进程无法启动"""
+
+
+def _load_cairosvg():
+    """导入 cairosvg；未安装或找不到 libcairo 时返回 None"""
+    try:
+        import cairosvg
+    except (ImportError, OSError):
+        return None
+    return cairosvg
+
+
+@lru_cache(maxsize=None)
+def resolve_backend(backend: str = "auto") -> Optional[str]:
+    """
+    返回实际可用的后端名称，都不可用时返回 None
+
+    结果按进程缓存：缺少 libcairo 时每次尝试导入 cairosvg 都要几十毫秒。
+    Pillow 只检查是否安装以及字体文件是否存在，真正的导入和字形检查留在渲染进程中
+    （见 check_backend），不增加服务进程的冷启动时间。
+    """
+    if backend in ("auto", "cairosvg") and _load_cairosvg() is not None:
+        return "cairosvg"
+    if backend in ("auto", "pillow") and importlib.util.find_spec("PIL") is not None and _font_path():
+        return "pillow"
+    return None
+
+
+def _font_path() -> Optional[str]:
+    """RASTER_FONT_PATH 或常见位置中存在的中文字体，都不存在时返回 None"""
+    path = os.getenv("RASTER_FONT_PATH")
+    if path:
+        return path if os.path.exists(path) else None
+    return next((candidate for candidate in _FONT_CANDIDATES if os.path.exists(candidate)), None)
+
+
+@lru_cache(maxsize=None)
+def renderer_id(backend: str = "auto") -> Optional[str]:
+    """后端和字体的标识，作为栅格缓存键的一部分；字体以路径、大小和修改时间区分"""
+    resolved = resolve_backend(backend)
+    if resolved == "cairosvg":
+        return f"cairosvg-{_load_cairosvg().__version__}"
+    if resolved == "pillow":
+        path = _font_path()
+        stat = os.stat(path)
+        font = hashlib.sha256(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+        return f"pillow-{font[:12]}"
+    return None
+
+
+def _load_font(path: str) -> bytes:
+    """读取字体并确认包含中文字形，否则抛出 RasterUnavailable"""
+    from PIL import ImageFont
+
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        font = ImageFont.truetype(io.BytesIO(data), 32)
+    except OSError as e:
+        raise RasterUnavailable(f"无法加载字体 {path}：{e}") from e
+
+    def glyph(text):
+        mask = font.getmask(text)
+        return mask.size, bytes(mask)
+
+    if glyph("汉") == glyph(_MISSING_GLYPH):
+        raise RasterUnavailable(f"字体 {path} 不包含中文字形，请用 RASTER_FONT_PATH 指定中文字体")
+    return data
+
+
+def check_backend(backend: str = "auto") -> str:
+    """返回可用的后端名称；没有后端或 Pillow 找不到中文字体时抛出 RasterUnavailable"""
+    resolved = resolve_backend(backend)
+    if resolved is None:
+        raise RasterUnavailable(NO_BACKEND)
+    if resolved == "pillow":
+        _load_font(_font_path())
+    return resolved
+
+
+def init_worker(backend: str = "auto") -> None:
+    """渲染进程初始化：选择后端并加载字体，渲染一张空白卡片预热"""
+    global _backend, _cairosvg, _font_data
+    resolved = resolve_backend(backend)
+    if resolved is None:
+        raise RasterUnavailable(NO_BACKEND)
+    if resolved == "cairosvg":
+        _cairosvg = _load_cairosvg()
+    else:
+        _font_data = _load_font(_font_path())
+    _backend = resolved
+    import svg_card
+    rasterize(svg_card.render_card("汉语", "hàn yǔ", [(110, "预热")]).encode("utf-8"), "png", 1)
+
+
+@lru_cache(maxsize=64)
+def _font(size: float):
+    from PIL import ImageFont
+
+    return ImageFont.truetype(io.BytesIO(_font_data), size)
+
+
+def _length(value: Optional[str], full: float) -> float:
+    if not value:
+        return 0.0
+    if value.endswith("%"):
+        return full * float(value[:-1]) / 100
+    return float(value)
+
+
+def _viewbox(root: ET.Element) -> Tuple[float, float]:
+    _, _, width, height = (float(v) for v in root.get("viewBox").replace(",", " ").split())
+    return width, height
+
+
+def _render_pillow(root: ET.Element, scale: float):
+    """按卡片模板用到的元素绘制：rect、line、text（y 为基线，支持 text-anchor）"""
+    from PIL import Image, ImageDraw
+
+    width, height = _viewbox(root)
+    image = Image.new("RGB", (round(width * scale), round(height * scale)), "white")
+    draw = ImageDraw.Draw(image)
+    for element in root.iter():
+        tag = element.tag.rpartition("}")[2]
+        if tag == "rect":
+            x = _length(element.get("x"), width) * scale
+            y = _length(element.get("y"), height) * scale
+            w = _length(element.get("width"), width) * scale
+            h = _length(element.get("height"), height) * scale
+            draw.rectangle([x, y, x + w - 1, y + h - 1], fill=element.get("fill", "black"))
+        elif tag == "line":
+            points = [(float(element.get("x1", 0)) * scale, float(element.get("y1", 0)) * scale),
+                      (float(element.get("x2", 0)) * scale, float(element.get("y2", 0)) * scale)]
+            stroke_width = float(element.get("stroke-width", 1)) * scale
+            draw.line(points, fill=element.get("stroke", "black"), width=max(1, round(stroke_width)))
+        elif tag == "text" and element.text:
+            anchor = {"middle": "ms", "end": "rs"}.get(element.get("text-anchor"), "ls")
+            size = round(float(element.get("font-size", 16)) * scale * 4) / 4
+            draw.text((float(element.get("x", 0)) * scale, float(element.get("y", 0)) * scale), element.text,
+                      fill=element.get("fill", "black"), font=_font(size), anchor=anchor)
+    return image
+
+
+def rasterize(svg: bytes, fmt: str, scale: float) -> bytes:
+    """在渲染进程中把 SVG 转为 PNG 或 WebP"""
+    if _backend is None:
+        init_worker(os.getenv("RASTER_BACKEND", "auto"))
+    root = ET.fromstring(svg)
+    if _backend == "cairosvg":
+        width, height = _viewbox(root)
+        png = _cairosvg.svg2png(bytestring=svg, output_width=round(width * scale),
+                                output_height=round(height * scale))
+        if fmt == "png":
+            return png
+        from PIL import Image
+
+        image = Image.open(io.BytesIO(png))
+    else:
+        image = _render_pillow(root, scale)
+
+    out = io.BytesIO()
+    if fmt == "webp":
+        image.save(out, "WEBP", quality=RASTER_WEBP_QUALITY, method=4)
+    else:
+        image.save(out, "PNG", compress_level=6)
+    return out.getvalue()
+
+
+class RasterCache:
+    """按 (渲染器, SVG 哈希, 格式, 缩放倍数) 缓存栅格结果，进程内 LRU 限制总字节数，可选的 SQLite 层在进程间共享"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, path: Optional[str] = None, max_disk_items: int = 100_000):
+        self.max_bytes = max_bytes
+        self.max_disk_items = max_disk_items
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        # 键包含内容哈希，条目不会过期，只按容量淘汰
+        self._disk: Optional[shared_db.SharedTable] = None
+        if path:
+            self._disk = shared_db.SharedTable.open(path, "rasters", "data", max_items=max_disk_items,
+                                                    label="栅格缓存")
+
+    @classmethod
+    def from_env(cls) -> "RasterCache":
+        """RASTER_CACHE_PATH 为空时只使用进程内缓存"""
+        return cls(
+            max_bytes=int(os.getenv("RASTER_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+            path=os.getenv("RASTER_CACHE_PATH", DEFAULT_RASTER_CACHE_PATH),
+            max_disk_items=int(os.getenv("RASTER_CACHE_DISK_SIZE", 100_000)),
+        )
+
+    @staticmethod
+    def make_key(renderer: str, digest: str, fmt: str, scale: float) -> str:
+        return f"{renderer}/{digest}.{fmt}@{scale:g}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return data
+            if self._disk is not None:
+                row = self._disk.get(key)
+                if row is not None:
+                    data = bytes(row[0])
+                    self._remember(key, data)
+                    self.disk_hits += 1
+                    return data
+            self.misses += 1
+            return None
+
+    def set(self, key: str, data: bytes) -> None:
+        with self._lock:
+            self._remember(key, data)
+            if self._disk is not None:
+                self._disk.set(key, data)
+
+    def _remember(self, key: str, data: bytes) -> None:
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._items[key] = data
+        self._bytes += len(data)
+        while self._items and self._bytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "items": len(self._items), "bytes": self._bytes}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
+
+
+class Rasterizer:
+    """
+    有界进程池 + 栅格缓存
+
+    进程池在第一次栅格化时才创建（spawn 方式，避免在多线程的服务进程中 fork）；
+    同时提交的任务数不超过 max_pending，相同的 (哈希, 格式, 倍数) 并发请求只栅格化一次。
+    """
+
+    def __init__(self, workers: int, backend: str = "auto", max_pending: Optional[int] = None,
+                 cache: Optional[RasterCache] = None):
+        self.workers = workers
+        self.backend = backend
+        self.max_pending = max_pending or workers * 4
+        self.cache = cache if cache is not None else RasterCache()
+        self.pending = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop = None
+
+    @classmethod
+    def from_env(cls) -> "Rasterizer":
+        workers = os.getenv("RASTER_WORKERS")
+        pending = os.getenv("RASTER_MAX_PENDING")
+        return cls(
+            workers=int(workers) if workers else min(4, os.cpu_count() or 1),
+            backend=os.getenv("RASTER_BACKEND", "auto"),
+            max_pending=int(pending) if pending else None,
+            cache=RasterCache.from_env(),
+        )
+
+    def available(self) -> bool:
+        return resolve_backend(self.backend) is not None
+
+    @property
+    def renderer(self) -> Optional[str]:
+        return renderer_id(self.backend)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=init_worker, initargs=(self.backend,),
+                )
+            return self._pool
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._slots_loop = loop
+        return self._slots
+
+    async def render(self, svg: bytes, digest: str, fmt: str, scale: float) -> bytes:
+        """返回栅格化结果，优先读缓存；digest 为 SVG 内容哈希"""
+        key = self.cache.make_key(self.renderer, digest, fmt, scale)
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+        return await self._flights.do(key, lambda: self._render(key, svg, fmt, scale))
+
+    async def _render(self, key: str, svg: bytes, fmt: str, scale: float) -> bytes:
+        async with self._semaphore():
+            self.pending += 1
+            try:
+                loop = asyncio.get_running_loop()
+                executor = self._executor()
+                data = await loop.run_in_executor(executor, rasterize, svg, fmt, scale)
+            except BrokenProcessPool:
+                # 渲染进程启动失败（如字体不含中文字形）或崩溃；丢弃进程池，下次请求重新创建
+                with self._pool_lock:
+                    if self._pool is executor:
+                        self._pool.shutdown(wait=False, cancel_futures=True)
+                        self._pool = None
+                raise RasterUnavailable("栅格化进程无法启动，请检查 RASTER_BACKEND 和 RASTER_FONT_PATH") from None
+            finally:
+                self.pending -= 1
+        self.cache.set(key, data)
+        return data
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+        self.cache.close()
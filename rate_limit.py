@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+提供商限流与重试
+
+- ProviderLimiter：每个提供商一个令牌桶（每秒请求数 + 突发量）加最大在途请求数，
+  等待队列有上限；队列已满或预计等待超过上限时立即抛出 RateLimitExceeded，
+  由接口层返回 503 和 Retry-After，而不是让请求在进程内堆积。
+- retry_async：指数退避加随机抖动的重试，优先使用提供商返回的 Retry-After。
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class RateLimitExceeded(Exception):
+    """本地限流拒绝请求，retry_after 为建议的重试等待秒数"""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} 请求过多，请 {retry_after:.1f} 秒后重试")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头，支持秒数和 HTTP 日期两种格式"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _env(provider: str, key: str, default: float) -> float:
+    """优先读取 <PROVIDER>_<KEY>，其次读取 LLM_<KEY>"""
+    value = os.getenv(f"{provider.upper()}_{key}") or os.getenv(f"LLM_{key}")
+    return float(value) if value else default
+
+
+class ProviderLimiter:
+    def __init__(self, provider: str, rate: float = 10.0, burst: float = 20.0, max_in_flight: int = 32,
+                 max_queue: int = 64, max_wait: float = 5.0):
+        self.provider = provider
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_env(cls, provider: str) -> "ProviderLimiter":
+        return cls(
+            provider,
+            rate=_env(provider, "RATE_LIMIT_RPS", 10.0),
+            burst=_env(provider, "RATE_LIMIT_BURST", 20.0),
+            max_in_flight=int(_env(provider, "MAX_IN_FLIGHT", 32)),
+            max_queue=int(_env(provider, "MAX_QUEUE", 64)),
+            max_wait=_env(provider, "MAX_QUEUE_WAIT", 5.0),
+        )
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        # 信号量绑定在事件循环上，循环变化时（如命令行多次 asyncio.run）重建
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._loop = loop
+            self.in_flight = 0
+        return self._semaphore
+
+    def _reserve_token(self, max_delay: float) -> float:
+        """预约一个令牌并返回需要等待的秒数；等待超过 max_delay 时不预约并抛出 RateLimitExceeded"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        delay = max(0.0, (1 - self._tokens) / self.rate)
+        if delay > max_delay:
+            self.rejected += 1
+            raise RateLimitExceeded(self.provider, delay)
+        # 令牌数允许为负，表示已被排队中的请求预约
+        self._tokens -= 1
+        return delay
+
+    async def acquire(self) -> None:
+        semaphore = self._get_semaphore()
+        # 有空闲名额且令牌充足时不进入等待队列
+        if not semaphore.locked() and self._tokens >= 1:
+            await semaphore.acquire()
+            self._reserve_token(0.0)
+            self.in_flight += 1
+            return
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise RateLimitExceeded(self.provider, max(1.0, self.waiting / self.rate))
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        self.waiting += 1
+        try:
+            try:
+                await asyncio.wait_for(semaphore.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise RateLimitExceeded(self.provider, self.max_wait) from None
+            try:
+                delay = self._reserve_token(max(0.0, deadline - loop.time()))
+                if delay:
+                    await asyncio.sleep(delay)
+            except BaseException:
+                semaphore.release()
+                raise
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    async def __aenter__(self) -> "ProviderLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
+
+
+async def retry_async(fn: Callable[[], Awaitable[T]], classify: Callable[[BaseException], Tuple[bool, Optional[float]]],
+                      attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                      on_retry: Optional[Callable[[BaseException, float], None]] = None) -> T:
+    """
+    调用 fn，失败且 classify 判断可重试时按指数退避加抖动重试
+
+    classify(exc) 返回 (是否可重试, 提供商给出的 Retry-After 秒数或 None)。
+    提供商给出的等待时间超过 max_delay 时不再重试，直接抛出。
+    """
+    for attempt in range(attempts):
+        try:
+            return await fn()
+        except Exception as e:
+            retryable, retry_after = classify(e)
+            if not retryable or attempt == attempts - 1:
+                raise
+            if retry_after is not None:
+                if retry_after > max_delay:
+                    raise
+                delay = retry_after
+            else:
+                # full jitter：在 [0, base * 2^attempt] 内随机等待，避免多个请求同时重试
+                delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            if on_retry is not None:
+                on_retry(e, delay)
+            await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    """返回提供商的限流器，同一提供商在进程内共享一个"""
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(provider)
+            if limiter is None:
+                limiter = _limiters[provider] = ProviderLimiter.from_env(provider)
+    return limiter
+
+
+def limiters() -> Dict[str, ProviderLimiter]:
+    """当前已创建的限流器，供指标采集使用"""
+    return dict(_limiters)
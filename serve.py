@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+生产模式启动：多工作进程、可选 uvloop、优雅退出
+
+主进程监听端口并以 spawn 方式启动 --workers 个 hypercorn 工作进程（各自导入 app）。
+hypercorn.run.run 在任一工作进程异常退出时会关闭全部进程，这里由 supervise 看护：
+只重新启动退出的那个进程，其余进程继续服务；启动后 WORKER_MIN_UPTIME 秒内就以错误
+状态退出（如导入 app 失败）时不再重试，整体退出。SIGHUP 优雅地替换全部工作进程。
+收到 SIGTERM/SIGINT 后停止接受新连接，等待进行中的请求最多 --graceful-timeout 秒，
+然后执行关闭钩子（关闭 HTTP 会话、线程池和缓存连接）。
+
+解释缓存和卡片缓存的 SQLite 文件以 WAL 模式在工作进程之间共享，增加进程数不会
+摊薄缓存命中率；词库文件只读内存映射，各进程共用操作系统的页缓存。
+
+用法：
+    python serve.py --workers 4 --bind 0.0.0.0:5000
+    SERVER_WORKERS=8 SERVER_LOOP=uvloop python serve.py
+
+开发时使用 python app.py（单进程，修改代码后自动重载）。
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from multiprocessing.connection import wait
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger("serve")
+
+# 工作进程启动后这么久（秒）内就以错误状态退出时视为无法启动（如导入 app 失败），不再重启；
+# 被信号杀死（如 OOM）的进程总是重启
+WORKER_MIN_UPTIME = 5.0
+
+
+def resolve_loop(loop: str) -> str:
+    """auto 时如果安装了 uvloop 就使用，否则使用 asyncio"""
+    if loop == "asyncio":
+        return loop
+    try:
+        import uvloop  # noqa: F401
+    except ImportError:
+        if loop == "uvloop":
+            sys.exit("未安装 uvloop：pip install uvloop")
+        return "asyncio"
+    return "uvloop"
+
+
+def prepare_shared_caches() -> None:
+    """在启动工作进程之前建好共享缓存的表并切换到 WAL 模式，避免多个进程同时初始化"""
+    from card_cache import CardResponseCache
+    from interpretation_cache import InterpretationCache
+    from raster import RasterCache
+
+    InterpretationCache.from_env().close()
+    CardResponseCache.from_env().close()
+    RasterCache.from_env().close()
+
+
+def supervise(config) -> int:
+    """启动 config.workers 个工作进程并看护，异常退出的进程单独重启；返回退出状态"""
+    if config.worker_class == "uvloop":
+        from hypercorn.asyncio.run import uvloop_worker as worker_func
+    else:
+        from hypercorn.asyncio.run import asyncio_worker as worker_func
+
+    ctx = multiprocessing.get_context("spawn")
+    sockets = config.create_sockets()
+    shutdown_event = ctx.Event()
+    started = {}
+    state = {"stopping": False, "reload": False}
+
+    def spawn():
+        process = ctx.Process(target=worker_func,
+                              kwargs={"config": config, "shutdown_event": shutdown_event, "sockets": sockets})
+        process.daemon = config.daemon
+        process.start()
+        started[process] = time.monotonic()
+
+    def stop_all(timeout):
+        shutdown_event.set()
+        deadline = time.monotonic() + timeout
+        for process in started:
+            process.join(max(0.0, deadline - time.monotonic()))
+        for process in started:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        started.clear()
+
+    def shutdown(*_):
+        state["stopping"] = True
+
+    def reload(*_):
+        state["reload"] = True
+
+    # 工作进程继承忽略 SIGINT 的设置，终端的 Ctrl+C 只由主进程处理，再通知工作进程优雅退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for _ in range(config.workers):
+        spawn()
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, reload)
+
+    exitcode = 0
+    try:
+        while not state["stopping"]:
+            if state["reload"]:
+                state["reload"] = False
+                stop_all(config.graceful_timeout + 5)
+                shutdown_event.clear()
+                for _ in range(config.workers):
+                    spawn()
+            wait([process.sentinel for process in started], timeout=1)
+            for process in [p for p in started if p.exitcode is not None]:
+                process.join()
+                uptime = time.monotonic() - started.pop(process)
+                if state["stopping"] or state["reload"]:
+                    continue
+                if process.exitcode > 0 and uptime < WORKER_MIN_UPTIME:
+                    logger.error("工作进程启动后立即退出，停止服务",
+                                 extra={"pid": process.pid, "exitcode": process.exitcode, "uptime": uptime})
+                    exitcode = process.exitcode
+                    state["stopping"] = True
+                    break
+                logger.warning("工作进程退出，重新启动",
+                               extra={"pid": process.pid, "exitcode": process.exitcode, "uptime": uptime})
+                spawn()
+    finally:
+        stop_all(config.graceful_timeout + 5)
+        for sock in sockets.secure_sockets + sockets.insecure_sockets + sockets.quic_sockets:
+            sock.close()
+    return exitcode
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bind", nargs="+", default=os.getenv("SERVER_BIND", "0.0.0.0:5000").split(","),
+                        help="监听地址，可指定多个")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVER_WORKERS") or os.cpu_count() or 1),
+                        help="工作进程数，默认为 CPU 核数")
+    parser.add_argument("--loop", choices=["auto", "asyncio", "uvloop"], default=os.getenv("SERVER_LOOP", "auto"),
+                        help="事件循环实现")
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.getenv("SERVER_GRACEFUL_TIMEOUT", 30)),
+                        help="退出时等待进行中请求的最长时间（秒）")
+    parser.add_argument("--access-log", action="store_true", help="输出访问日志到标准输出")
+    args = parser.parse_args()
+
+    import hypercorn.config
+
+    from logging_config import setup_logging, use_root_logging
+
+    config = hypercorn.config.Config()
+    config.application_path = "app:app"
+    config.bind = args.bind
+    config.workers = max(1, args.workers)
+    config.worker_class = resolve_loop(args.loop)
+    config.graceful_timeout = args.graceful_timeout
+    use_root_logging(config, access_log=args.access_log)
+
+    setup_logging()
+    prepare_shared_caches()
+    print(f"启动 {config.workers} 个工作进程（{config.worker_class}），监听 {', '.join(config.bind)}", flush=True)
+    sys.exit(supervise(config))
+
+
+if __name__ == "__main__":
+    main()
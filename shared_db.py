@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+多进程共享的 SQLite 连接和缓存表
+
+生产模式下多个工作进程各自打开同一个文件。WAL 模式允许读写并发，读不会被写阻塞；
+多个进程同时写时由 busy_timeout 排队等待，而不是立即报 "database is locked"。
+解释缓存、卡片缓存和栅格缓存的持久层都是 SharedTable。
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 等待其他进程释放写锁的最长时间（秒）
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", 2))
+
+# 每写入多少次清理一次过期和超量的条目
+PRUNE_INTERVAL = 128
+# 命中时的访问时间先记在内存里，攒够这么多条或每隔 TOUCH_FLUSH_INTERVAL 秒批量写回
+TOUCH_BATCH = 256
+TOUCH_FLUSH_INTERVAL = 1.0
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """打开（必要时创建）共享数据库，自动提交模式，可跨线程使用"""
+    if path != ":memory:":
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=SQLITE_BUSY_TIMEOUT)
+    db.execute("PRAGMA journal_mode = WAL")
+    # WAL 模式下 NORMAL 只在检查点时同步，断电最多丢失最近的缓存写入
+    db.execute("PRAGMA synchronous = NORMAL")
+    return db
+
+
+class SharedTable:
+    """
+    工作进程共享的键值缓存表：(key, <值列>, [expires_at,] accessed_at)
+
+    ttl 为 None 时条目不过期（如按内容哈希寻址的栅格结果），只按容量淘汰。
+    每写入 PRUNE_INTERVAL 次删除过期条目，并按最近访问时间淘汰超出 max_items 的条目。
+    读写出错（如其他工作进程长时间占用写锁）时记录警告并按未命中处理，不影响请求。
+    连接不加锁，由调用方与进程内缓存层一起加锁。
+
+    命中只执行 SELECT：访问时间的更新和清理都交给后台维护线程，用它自己的连接
+    批量执行，不在事件循环上等待写锁。close() 时写回尚未提交的访问时间。
+    """
+
+    def __init__(self, db: sqlite3.Connection, table: str, value_column: str, ttl: Optional[float],
+                 max_items: int, label: str, path: str):
+        self._db = db
+        self.path = path
+        self.table = table
+        self.value_column = value_column
+        self.ttl = ttl
+        self.max_items = max_items
+        self.label = label
+        self.evictions = 0
+        self._writes = 0
+        self._touched: Dict[str, float] = {}
+        self._prune_requested = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._maintainer: Optional[threading.Thread] = None
+
+    @classmethod
+    def open(cls, path: str, table: str, value_column: str = "value", value_type: str = "BLOB",
+             ttl: Optional[float] = None, max_items: int = 100_000, label: str = "缓存") -> Optional["SharedTable"]:
+        """打开或建表；打不开时（如只读文件系统）返回 None，调用方退化为纯进程内缓存"""
+        expires = " expires_at REAL NOT NULL," if ttl is not None else ""
+        try:
+            db = connect(path)
+            db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                f" key TEXT PRIMARY KEY,"
+                f" {value_column} {value_type} NOT NULL,{expires}"
+                f" accessed_at REAL NOT NULL)"
+            )
+            db.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_accessed ON {table} (accessed_at)")
+        except (sqlite3.Error, OSError) as e:
+            logger.warning("无法打开%s，仅使用进程内缓存", label, extra={"path": path, "error": str(e)})
+            return None
+        return cls(db, table, value_column, ttl, max_items, label, path)
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """返回 (值, 过期时间)，不过期的表过期时间为 inf；未命中或已过期时返回 None"""
+        now = time.time()
+        expires = ", expires_at" if self.ttl is not None else ""
+        try:
+            row = self._db.execute(
+                f"SELECT {self.value_column}{expires} FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            expires_at = row[1] if self.ttl is not None else math.inf
+            if expires_at <= now:
+                # 过期条目由后台清理或下次写入覆盖
+                return None
+            self._touch(key, now)
+            return row[0], expires_at
+        except sqlite3.Error as e:
+            logger.warning("读取%s失败", self.label, extra={"table": self.table, "error": str(e)})
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        try:
+            if self.ttl is not None:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, {self.value_column}, expires_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    (key, value, now + self.ttl, now),
+                )
+            else:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, {self.value_column}, accessed_at) VALUES (?, ?, ?)",
+                    (key, value, now),
+                )
+            self._writes += 1
+            if self._writes % PRUNE_INTERVAL == 0:
+                with self._lock:
+                    self._prune_requested = True
+                self._start_maintainer()
+                self._wake.set()
+        except sqlite3.Error as e:
+            logger.warning("写入%s失败", self.label, extra={"table": self.table, "error": str(e)})
+
+    def _touch(self, key: str, now: float) -> None:
+        with self._lock:
+            self._touched[key] = now
+            pending = len(self._touched)
+        self._start_maintainer()
+        if pending >= TOUCH_BATCH:
+            self._wake.set()
+
+    def _start_maintainer(self) -> None:
+        """第一次需要后台写入时启动维护线程（不在导入或 fork 之前启动）"""
+        if self._maintainer is None and not self._closed:
+            with self._lock:
+                if self._maintainer is None:
+                    self._maintainer = threading.Thread(target=self._maintain, name=f"shared-db-{self.table}",
+                                                        daemon=True)
+                    self._maintainer.start()
+
+    def _maintain(self) -> None:
+        # 内存数据库只能通过原连接访问；文件数据库用单独的连接，不与调用方的连接争用
+        try:
+            db = self._db if self.path == ":memory:" else connect(self.path)
+        except sqlite3.Error as e:
+            logger.warning("维护%s失败，不再更新访问时间", self.label, extra={"table": self.table, "error": str(e)})
+            return
+        try:
+            while True:
+                self._wake.wait(TOUCH_FLUSH_INTERVAL)
+                self._wake.clear()
+                closed = self._closed
+                self._flush(db)
+                if closed:
+                    return
+        finally:
+            if db is not self._db:
+                db.close()
+
+    def _flush(self, db: sqlite3.Connection) -> None:
+        """批量写回访问时间，按需清理"""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            prune, self._prune_requested = self._prune_requested, False
+        try:
+            if touched:
+                db.execute("BEGIN")
+                try:
+                    db.executemany(f"UPDATE {self.table} SET accessed_at = MAX(accessed_at, ?) WHERE key = ?",
+                                   [(at, key) for key, at in touched.items()])
+                    db.execute("COMMIT")
+                except BaseException:
+                    db.execute("ROLLBACK")
+                    raise
+            if prune:
+                self._prune(db, time.time())
+        except sqlite3.Error as e:
+            logger.warning("维护%s失败", self.label, extra={"table": self.table, "error": str(e)})
+
+    def _prune(self, db: sqlite3.Connection, now: float) -> None:
+        """删除过期条目，并按最近访问时间淘汰超出容量的条目"""
+        if self.ttl is not None:
+            db.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+        (count,) = db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        overflow = count - self.max_items
+        if overflow > 0:
+            db.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f" SELECT key FROM {self.table} ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+            with self._lock:
+                self.evictions += overflow
+
+    def clear(self) -> None:
+        with self._lock:
+            self._touched.clear()
+        self._db.execute(f"DELETE FROM {self.table}")
+
+    def close(self) -> None:
+        """停止维护线程（先写回尚未提交的访问时间），然后关闭连接"""
+        self._closed = True
+        if self._maintainer is not None:
+            self._wake.set()
+            self._maintainer.join()
+        self._db.close()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+SVG 卡片渲染
+
+卡片的背景、标题、分隔线等静态部分在模块加载时预先拼好，每次渲染只转义并
+拼接词语、拼音和解释文字。输出与 svgwrite 逐元素构建后 tostring() 的结果逐字节一致，
+render_card_svgwrite 保留了原来的构建方式，供基准测试和一致性校验使用。
+解释文字的换行、字号和行距由 text_layout 按字宽计算。
+"""
+
+from typing import Dict, List, Sequence, Tuple, Union
+
+import text_layout
+
+# 修改卡片模板或排版时递增，跨进程共享的卡片缓存会自然失效
+TEMPLATE_VERSION = "3"
+
+CARD_WIDTH = 200
+CARD_HEIGHT = 240
+FONT_FAMILY = 'Noto Sans SC'
+
+# 解释文字的起始 y 坐标、底部边距、文本框宽度（左右各留 15% 边距）和字号范围
+TEXT_TOP = 110
+BOTTOM_MARGIN = 10
+TEXT_BOX_WIDTH = CARD_WIDTH * 0.7
+TEXT_BOX_HEIGHT = CARD_HEIGHT - TEXT_TOP - BOTTOM_MARGIN
+MAX_FONT_SIZE = 8
+MIN_FONT_SIZE = 5
+
+Number = Union[int, float]
+
+_CENTER_X = CARD_WIDTH / 2
+
+_HEADER = (
+    f'<svg baseProfile="full" height="100%" version="1.1" viewBox="0 0 {CARD_WIDTH} {CARD_HEIGHT}" width="100%"'
+    ' xmlns="http://www.w3.org/2000/svg" xmlns:ev="http://www.w3.org/2001/xml-events"'
+    ' xmlns:xlink="http://www.w3.org/1999/xlink">'
+    '<defs />'
+    '<rect fill="#FAF6F1" height="100%" width="100%" x="0" y="0" />'
+    f'<text fill="#333333" font-family="{FONT_FAMILY}" font-size="8" text-anchor="middle" x="{_CENTER_X}" y="20">汉语新解</text>'
+    f'<line stroke="#333333" stroke-width="0.5" x1="{CARD_WIDTH * 0.15}" x2="{CARD_WIDTH * 0.85}" y1="28" y2="28" />'
+    f'<text fill="#333333" font-family="{FONT_FAMILY}" font-size="20" text-anchor="middle" x="{_CENTER_X}" y="65">'
+)
+_WORD_TO_PINYIN = (
+    '</text>'
+    f'<text fill="#666666" font-family="{FONT_FAMILY}" font-size="8" text-anchor="middle" x="{_CENTER_X}" y="85">'
+)
+_FOOTER = '</text></svg>'
+_line_prefixes: Dict[Number, str] = {}
+
+
+def _line_prefix(font_size: Number) -> str:
+    prefix = _line_prefixes.get(font_size)
+    if prefix is None:
+        prefix = _line_prefixes[font_size] = (
+            f'</text><text fill="#333333" font-family="{FONT_FAMILY}" font-size="{font_size}"'
+            f' text-anchor="middle" x="{_CENTER_X}" y="'
+        )
+    return prefix
+
+
+def _number(value: float) -> Number:
+    """坐标和字号保留两位小数，整数值输出为整数"""
+    value = round(float(value), 2)
+    return int(value) if value.is_integer() else value
+
+
+def _escape(text: str) -> str:
+    """与 ElementTree 序列化文本节点时的转义规则一致"""
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
+
+def layout_interpretation(text: str) -> Tuple[Number, List[Tuple[Number, str]]]:
+    """排版解释文字，返回 (字号, [(y 坐标, 行文字)])；放不下时缩小字号，仍放不下则截断"""
+    layout = text_layout.layout_text(text, TEXT_BOX_WIDTH, TEXT_BOX_HEIGHT,
+                                     max_font_size=MAX_FONT_SIZE, min_font_size=MIN_FONT_SIZE)
+    positioned = [(_number(TEXT_TOP + i * layout.line_height), line) for i, line in enumerate(layout.lines)]
+    return _number(layout.font_size), positioned
+
+
+def render_card(word: str, pinyin: str, lines: Sequence[Tuple[Number, str]], font_size: Number = MAX_FONT_SIZE) -> str:
+    """把词语、拼音和已排版的解释文字拼接进预编译的卡片模板"""
+    line_prefix = _line_prefix(font_size)
+    parts = [_HEADER, _escape(word), _WORD_TO_PINYIN, _escape(pinyin)]
+    for y, line in lines:
+        parts.append(line_prefix)
+        parts.append(str(y))
+        parts.append('">')
+        parts.append(_escape(line))
+    parts.append(_FOOTER)
+    return ''.join(parts)
+
+
+def render_card_svgwrite(word: str, pinyin: str, lines: Sequence[Tuple[Number, str]],
+                         font_size: Number = MAX_FONT_SIZE) -> str:
+    """用 svgwrite 逐元素构建卡片（原实现），仅用于基准测试和一致性校验"""
+    import svgwrite
+
+    width = CARD_WIDTH
+    dwg = svgwrite.Drawing(size=('100%', '100%'), viewBox=f'0 0 {width} {CARD_HEIGHT}')
+    dwg.add(dwg.rect(insert=(0, 0), size=('100%', '100%'), fill='#FAF6F1'))
+    dwg.add(dwg.text('汉语新解', insert=(width/2, 20), font_size=8, font_family=FONT_FAMILY,
+                     text_anchor='middle', fill='#333333'))
+    dwg.add(dwg.line(start=(width*0.15, 28), end=(width*0.85, 28),
+                     stroke='#333333', stroke_width=0.5))
+    dwg.add(dwg.text(word, insert=(width/2, 65), font_size=20, font_family=FONT_FAMILY,
+                     text_anchor='middle', fill='#333333'))
+    dwg.add(dwg.text(pinyin, insert=(width/2, 85), font_size=8, font_family=FONT_FAMILY,
+                     text_anchor='middle', fill='#666666'))
+    for y, line in lines:
+        dwg.add(dwg.text(line, insert=(width/2, y), font_size=font_size, font_family=FONT_FAMILY,
+                         text_anchor='middle', fill='#333333'))
+    return dwg.tostring()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+有界并发的异步映射：最多同时执行 limit 个任务，按完成顺序逐个产出结果
+
+输入按需从迭代器中取出，已产出的结果不会保留，适合处理数千条以上的批量任务。
+"""
+
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Iterable, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+async def map_unordered(fn: Callable[[T], Awaitable[R]], items: Iterable[T], limit: int) -> AsyncIterator[R]:
+    """
+    对 items 中每一项执行 fn，按完成顺序产出结果
+
+    fn 抛出的异常会在产出对应结果时重新抛出，调用方如需继续处理其余项，
+    应在 fn 内部自行捕获异常。生成器提前关闭时会取消尚未完成的任务。
+    """
+    iterator = iter(items)
+    pending = set()
+
+    def submit() -> bool:
+        for item in iterator:
+            pending.add(asyncio.ensure_future(fn(item)))
+            return True
+        return False
+
+    try:
+        for _ in range(max(1, limit)):
+            if not submit():
+                break
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.discard(task)
+                submit()
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -3,6 +3,7 @@
 
 import sys
 import io
+import asyncio
 
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
@@ -10,6 +11,6 @@ from chinese_word_reinterpreter import ChineseWordReinterpreter
 
 interpreter = ChineseWordReinterpreter()
 word = "出人头地"
-result = interpreter.interpret(word)
+result = asyncio.run(interpreter.interpret(word))
 print(f"\n词语：{word}")
 print(f"解释：{result}")
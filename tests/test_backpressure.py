@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""提供商持续返回 429/5xx 时接口返回 503 和 Retry-After，而不是 200 和兜底解释"""
+
+import asyncio
+import contextlib
+import importlib
+
+import pytest
+from aiohttp import web
+
+import llm_adapter
+
+
+@pytest.fixture(scope="module")
+def app_module(tmp_path_factory):
+    cache_dir = tmp_path_factory.mktemp("cache")
+    with pytest.MonkeyPatch.context() as mp:
+        for name in ("INTERPRETATION_CACHE_PATH", "CARD_CACHE_PATH", "RASTER_CACHE_PATH"):
+            mp.setenv(name, str(cache_dir / f"{name.lower()}.sqlite3"))
+        yield importlib.import_module("app")
+
+
+@contextlib.asynccontextmanager
+async def deepseek_stub(monkeypatch, status, headers):
+    """本地模拟 DeepSeek 接口，每个请求都返回给定的状态码和响应头，requests 记录请求次数"""
+    requests = []
+
+    async def handler(request):
+        requests.append(request)
+        return web.json_response({"error": {"message": "busy"}}, status=status, headers=headers)
+
+    app = web.Application()
+    app.router.add_post("/chat/completions", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "test")
+    monkeypatch.setenv("DEEPSEEK_BASE_URL", f"http://127.0.0.1:{port}")
+    monkeypatch.setattr(llm_adapter, "LLM_RETRY_BASE_DELAY", 0.01)
+    try:
+        yield requests
+    finally:
+        await llm_adapter.registry.aclose()
+        await runner.cleanup()
+
+
+async def post_interpret(app_module, word):
+    client = app_module.app.test_client()
+    response = await client.post("/interpret", json={"word": word, "model": "deepseek"})
+    return response.status_code, response.headers.get("Retry-After"), await response.get_json()
+
+
+def test_long_retry_after_returns_503_without_retrying(monkeypatch, app_module):
+    async def run():
+        async with deepseek_stub(monkeypatch, 429, {"Retry-After": "120"}) as requests:
+            status, retry_after, body = await post_interpret(app_module, "退避测试甲")
+        assert status == 503
+        assert retry_after == "120"
+        assert body["retry_after"] == 120
+        # Retry-After 超过 LLM_RETRY_MAX_DELAY，不在进程内等待
+        assert len(requests) == 1
+
+    asyncio.run(run())
+
+
+def test_exhausted_retries_return_503(monkeypatch, app_module):
+    monkeypatch.setattr(llm_adapter, "LLM_RETRY_MAX_DELAY", 3.0)
+
+    async def run():
+        async with deepseek_stub(monkeypatch, 503, {}) as requests:
+            status, retry_after, body = await post_interpret(app_module, "退避测试乙")
+        assert status == 503
+        # 提供商没有给出 Retry-After 时建议等待 LLM_RETRY_MAX_DELAY 秒
+        assert retry_after == "3"
+        assert len(requests) == llm_adapter.LLM_MAX_RETRIES + 1
+
+    asyncio.run(run())
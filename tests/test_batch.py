@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+"""批量生成：_complete 是唯一的批量能力来源，auto 模式经路由打包请求"""
+
+import asyncio
+import json
+
+import pytest
+
+import llm_adapter
+from llm_adapter import AdapterRegistry, LLMAdapter, RoutingAdapter
+
+
+class FakeAdapter(LLMAdapter):
+    """按词语返回固定解释的假提供商，prompts 记录收到的批量请求"""
+    name = "fake"
+
+    def __init__(self):
+        self.prompts = []
+
+    async def _generate_interpretation(self, word: str) -> str:
+        return f"{word}的解释"
+
+    async def _complete(self, prompt: str, max_tokens: int, json_mode: bool = False) -> str:
+        self.prompts.append(prompt)
+        words = json.loads(prompt.rsplit("词语：", 1)[1])
+        return json.dumps({word: f"{word}的批量解释" for word in words}, ensure_ascii=False)
+
+
+def test_adapter_without_complete_cannot_be_built():
+    class Incomplete(LLMAdapter):
+        name = "incomplete"
+
+        async def _generate_interpretation(self, word: str) -> str:
+            return word
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_routing_adapter_packs_words_through_provider(monkeypatch):
+    monkeypatch.setattr(llm_adapter, "registry", AdapterRegistry({"fake": FakeAdapter}))
+    monkeypatch.setenv("ROUTER_PROVIDERS", "fake")
+    monkeypatch.setenv("AUTO_BATCH_SIZE", "3")
+    words = ["内卷", "躺平", "摸鱼", "佛系"]
+
+    async def run():
+        adapter = RoutingAdapter()
+        assert adapter.batch_size == 3
+        return await adapter.generate_interpretations(words)
+
+    results = asyncio.run(run())
+    assert results == {word: f"{word}的批量解释" for word in words}
+    assert len(llm_adapter.registry.get("fake").prompts) == 2
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+"""LLM 失败而使用默认解释的词语不写入检查点，重新运行时再次尝试"""
+
+import argparse
+import asyncio
+import io
+import json
+
+import generate_cards
+from llm_adapter import LLMAdapter, LLMError
+
+
+class FlakyAdapter(LLMAdapter):
+    """第一次调用时 fail 中的词语失败，之后都成功"""
+    name = "flaky"
+    rate_limited = False
+
+    def __init__(self, fail):
+        self.fail = set(fail)
+
+    async def _generate_interpretation(self, word: str) -> str:
+        if word in self.fail:
+            self.fail.discard(word)
+            raise LLMError("HTTP 400")
+        return f"{word}的解释"
+
+    async def _complete(self, prompt: str, max_tokens: int, json_mode: bool = False) -> str:
+        raise LLMError("不支持批量")
+
+
+def generate(monkeypatch, out_dir, adapter, words):
+    monkeypatch.setattr(generate_cards, "get_llm_adapter", lambda model: adapter)
+    args = argparse.Namespace(out=str(out_dir), model="flaky", no_cache=True, batch_size=2, raster=[], scale=[],
+                              raster_backend="auto", workers=1, concurrency=2, progress_every=1000)
+    asyncio.run(generate_cards.run(args, io.StringIO("\n".join(words))))
+    with open(out_dir / generate_cards.MANIFEST_NAME, encoding="utf-8") as f:
+        manifest = json.load(f)
+    checkpoint = generate_cards.load_checkpoint(str(out_dir / generate_cards.CHECKPOINT_NAME))
+    return manifest, checkpoint
+
+
+def test_fallback_words_are_retried(monkeypatch, tmp_path):
+    words = ["退避测试甲", "退避测试乙", "退避测试丙"]
+    adapter = FlakyAdapter(fail=["退避测试乙"])
+
+    manifest, checkpoint = generate(monkeypatch, tmp_path, adapter, words)
+    assert manifest["count"] == 3
+    assert manifest["fallbacks"] == 1
+    assert [card["word"] for card in manifest["cards"] if card.get("fallback")] == ["退避测试乙"]
+    assert set(checkpoint) == {"退避测试甲", "退避测试丙"}
+
+    manifest, checkpoint = generate(monkeypatch, tmp_path, adapter, words)
+    assert manifest["fallbacks"] == 0
+    assert set(checkpoint) == set(words)
+    card = next(card for card in manifest["cards"] if card["word"] == "退避测试乙")
+    assert card["interpretation"] == "退避测试乙的解释"
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+
+"""冷启动导入耗时不超过预算和基线，且不提前导入提供商 SDK"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_app_import_time_within_budget():
+    result = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "benchmarks", "bench_import_time.py"), "--runs", "3", "--top", "0"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""LLM 失败时的兜底文本不能进入解释缓存"""
+
+import asyncio
+import contextlib
+
+import pytest
+from aiohttp import web
+
+from chinese_word_reinterpreter import ChineseWordReinterpreter
+from interpretation_cache import InterpretationCache
+from lexicon import Lexicon
+from llm_adapter import DeepSeekAdapter, LLMError
+
+WORD = "内卷"
+
+
+@contextlib.asynccontextmanager
+async def deepseek_stub(monkeypatch, body, content_type):
+    """本地模拟 DeepSeek 接口，每个请求都返回 HTTP 200 和给定的响应体"""
+    async def handler(request):
+        return web.Response(text=body, content_type=content_type)
+
+    app = web.Application()
+    app.router.add_post("/chat/completions", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "test")
+    monkeypatch.setenv("DEEPSEEK_BASE_URL", f"http://127.0.0.1:{port}")
+    adapter = DeepSeekAdapter()
+    try:
+        yield adapter
+    finally:
+        await adapter.aclose()
+        await runner.cleanup()
+
+
+@pytest.mark.parametrize("body, content_type", [
+    ("<html><body><h1>502 Bad Gateway</h1></body></html>", "text/html"),
+    ('{"choices": [', "application/json"),
+    ('{"message": "ok"}', "application/json"),
+])
+def test_malformed_response_is_not_cached(monkeypatch, tmp_path, body, content_type):
+    async def run():
+        async with deepseek_stub(monkeypatch, body, content_type) as adapter:
+            with pytest.raises(LLMError):
+                await adapter.generate_interpretation(WORD)
+
+            cache = InterpretationCache(path=str(tmp_path / "interpretations.sqlite3"))
+            interpreter = ChineseWordReinterpreter(cache=cache, lexicon=Lexicon.builtin())
+            interpretation = await interpreter.interpret_word(WORD, adapter)
+            assert interpretation == interpreter._generate_critical_interpretation(WORD)
+            assert cache.get(WORD, adapter.name) is None
+            assert cache.stats()["stores"] == 0
+            cache.close()
+
+    asyncio.run(run())
+
+
+def test_successful_response_is_cached(monkeypatch, tmp_path):
+    body = '{"choices": [{"message": {"content": "用最快的速度原地踏步。"}}]}'
+
+    async def run():
+        async with deepseek_stub(monkeypatch, body, "application/json") as adapter:
+            cache = InterpretationCache(path=str(tmp_path / "interpretations.sqlite3"))
+            interpreter = ChineseWordReinterpreter(cache=cache, lexicon=Lexicon.builtin())
+            assert await interpreter.interpret_word(WORD, adapter) == "用最快的速度原地踏步。"
+            assert cache.get(WORD, adapter.name) == "用最快的速度原地踏步。"
+            cache.close()
+
+    asyncio.run(run())
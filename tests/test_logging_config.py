@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+"""结构化日志：extra= 传入的字段按 logfmt/JSON 输出"""
+
+import json
+import logging
+
+from logging_config import StructuredFormatter
+
+
+def make_record(msg, *args, **extra):
+    record = logging.makeLogRecord({'name': 'app', 'levelname': 'INFO', 'levelno': logging.INFO,
+                                    'msg': msg, 'args': args})
+    record.__dict__.update(extra)
+    return record
+
+
+def test_logfmt_outputs_extra_fields():
+    line = StructuredFormatter('logfmt').format(make_record("开始处理请求", word="内卷", model="deepseek"))
+    assert line.split(' ', 1)[0].startswith('ts=')
+    assert ' level=INFO logger=app msg=开始处理请求 word=内卷 model=deepseek' in line
+
+
+def test_logfmt_quotes_values_with_spaces():
+    line = StructuredFormatter('logfmt').format(make_record("LLM 调用失败", error='HTTP 500: "x"', latency=0.1234567))
+    assert 'msg="LLM 调用失败"' in line
+    assert 'error="HTTP 500: \\"x\\""' in line
+    assert 'latency=0.123457' in line
+
+
+def test_json_is_one_object_per_line():
+    record = make_record("写入%s失败", "缓存", table="cards")
+    fields = json.loads(StructuredFormatter('json').format(record))
+    assert fields['msg'] == "写入缓存失败"
+    assert fields['table'] == "cards"
+    assert fields['level'] == "INFO"
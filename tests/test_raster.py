@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""没有中文字体时栅格化明确失败，不输出也不缓存满是方框的图片"""
+
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+import raster
+import svg_card
+from raster import RasterCache, Rasterizer, RasterUnavailable
+
+
+@pytest.fixture
+def pillow_font(monkeypatch):
+    """只使用 pillow 后端，字体由 RASTER_FONT_PATH 决定；每个测试重新解析后端"""
+    monkeypatch.setattr(raster, "_load_cairosvg", lambda: None)
+
+    def use(path):
+        monkeypatch.setenv("RASTER_FONT_PATH", str(path))
+        raster.resolve_backend.cache_clear()
+        raster.renderer_id.cache_clear()
+
+    yield use
+    raster.resolve_backend.cache_clear()
+    raster.renderer_id.cache_clear()
+
+
+def test_pillow_without_font_is_unavailable(pillow_font, tmp_path):
+    pillow_font(tmp_path / "missing.ttc")
+    assert raster.resolve_backend("auto") is None
+    assert not Rasterizer(workers=1, backend="pillow").available()
+    with pytest.raises(RasterUnavailable):
+        raster.check_backend("pillow")
+
+
+def test_broken_font_is_not_rendered_or_cached(pillow_font, tmp_path):
+    font = tmp_path / "broken.ttc"
+    font.write_bytes(b"not a font")
+    pillow_font(font)
+    with pytest.raises(RasterUnavailable):
+        raster.check_backend("pillow")
+
+    svg = svg_card.render_card("内卷", "nèi juǎn", [(110, "原地踏步")]).encode("utf-8")
+    rasterizer = Rasterizer(workers=1, backend="pillow", cache=RasterCache())
+
+    async def run():
+        with pytest.raises(RasterUnavailable):
+            await rasterizer.render(svg, hashlib.sha256(svg).hexdigest(), "png", 1)
+
+    try:
+        asyncio.run(run())
+    finally:
+        rasterizer.shutdown()
+    assert rasterizer.cache.stats()["items"] == 0
+
+
+def test_cache_key_changes_with_font(pillow_font, tmp_path):
+    font = tmp_path / "font.ttc"
+    font.write_bytes(b"v1")
+    pillow_font(font)
+    before = raster.renderer_id("pillow")
+    font.write_bytes(b"version 2")
+    os.utime(font, ns=(0, 0))
+    raster.renderer_id.cache_clear()
+    after = raster.renderer_id("pillow")
+    assert before.startswith("pillow-") and after.startswith("pillow-") and before != after
+    assert RasterCache.make_key(before, "abc", "png", 2) != RasterCache.make_key(after, "abc", "png", 2)
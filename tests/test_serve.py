@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""serve.py 的主进程在工作进程崩溃后只重启该进程，服务不中断"""
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(not os.path.exists(f"/proc/{os.getpid()}/task/{os.getpid()}/children"),
+                                reason="需要 /proc/<pid>/task/<pid>/children")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def workers(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        children = f.read().split()
+    result = []
+    for child in children:
+        try:
+            with open(f"/proc/{child}/cmdline", "rb") as f:
+                if b"spawn_main" in f.read():
+                    result.append(int(child))
+        except FileNotFoundError:
+            pass
+    return result
+
+
+def wait_until(predicate, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if predicate():
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def test_crashed_worker_is_restarted(tmp_path):
+    port = free_port()
+    env = dict(os.environ, LOG_LEVEL="WARNING",
+               INTERPRETATION_CACHE_PATH=str(tmp_path / "interpretations.sqlite3"),
+               CARD_CACHE_PATH=str(tmp_path / "cards.sqlite3"), RASTER_CACHE_PATH=str(tmp_path / "rasters.sqlite3"))
+    server = subprocess.Popen([sys.executable, "serve.py", "--workers", "2", "--bind", f"127.0.0.1:{port}"],
+                              cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+    def healthy():
+        return urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=2).status == 200
+
+    try:
+        assert wait_until(lambda: len(workers(server.pid)) == 2 and healthy())
+        crashed = workers(server.pid)[0]
+        os.kill(crashed, signal.SIGKILL)
+        assert wait_until(lambda: len(workers(server.pid)) == 2 and crashed not in workers(server.pid))
+        assert server.poll() is None
+        assert wait_until(healthy)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        output = server.communicate(timeout=60)[0].decode()
+    assert server.returncode == 0, output
+    assert "工作进程退出，重新启动" in output
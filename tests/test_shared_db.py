@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+"""SharedTable 命中时不写数据库，访问时间和清理由维护线程批量完成"""
+
+import sqlite3
+import time
+
+import shared_db
+from shared_db import SharedTable
+
+
+def accessed_at(path, key):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT accessed_at FROM items WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_hit_touches_are_batched_and_flushed_on_close(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_db, "TOUCH_FLUSH_INTERVAL", 60.0)
+    path = str(tmp_path / "items.sqlite3")
+    table = SharedTable.open(path, "items")
+    table.set("a", b"1")
+    written = accessed_at(path, "a")
+
+    statements = []
+    table._db.set_trace_callback(statements.append)
+    time.sleep(0.01)
+    assert table.get("a") == (b"1", float("inf"))
+    assert statements and all(statement.startswith("SELECT") for statement in statements)
+    assert accessed_at(path, "a") == written
+
+    table.close()
+    assert accessed_at(path, "a") > written
+
+
+def test_prune_runs_on_maintenance_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_db, "PRUNE_INTERVAL", 4)
+    path = str(tmp_path / "items.sqlite3")
+    table = SharedTable.open(path, "items", max_items=2)
+    statements = []
+    table._db.set_trace_callback(statements.append)
+    for i in range(4):
+        table.set(str(i), b"x")
+        time.sleep(0.001)
+    table.close()
+
+    assert not any("COUNT" in statement or "DELETE" in statement for statement in statements)
+    assert table.evictions == 2
+    with sqlite3.connect(path) as db:
+        assert sorted(key for (key,) in db.execute("SELECT key FROM items")) == ["2", "3"]
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按字宽排版卡片解释文字
+
+- 字宽：预先计算的字宽表，单位为 em（字号的倍数）。中日韩全角字符和东亚歧义宽度字符
+  （引号、破折号、省略号等，在中文字体中按全角显示）为 1，拉丁字母、数字和半角标点
+  按 Noto Sans 的近似比例计算。
+- 换行：拉丁单词和数字不会从中间断开；遵循避头尾规则，句末标点不出现在行首
+  （悬挂在上一行末尾），前引号和前括号不留在行尾。
+- 缩小字号：按最大字号排不下时逐级缩小字号；到最小字号仍排不下时截断，末行以 “…” 结尾。
+  不会像以前那样静默丢弃超出底边的行。
+
+排版结果按 (文字, 文本框, 参数) 记忆化，批量生成时相同的解释只排版一次。
+"""
+
+import os
+import re
+import unicodedata
+from array import array
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+
+LAYOUT_CACHE_SIZE = int(os.getenv('LAYOUT_CACHE_SIZE', 4096))
+
+# 不能出现在行首的字符（避头）和不能出现在行尾的字符（避尾）
+NO_LINE_START = frozenset('，。、；：！？）】」』》〉〕”’…—·%,.;:!?)]}')
+NO_LINE_END = frozenset('（【「『《〈〔“‘([{')
+# 卡片沿用原来的版式：在这些标点后强制换行，每个分句各占一行
+DEFAULT_BREAK_AFTER = '。，；！？、'
+ELLIPSIS = '…'
+
+# ASCII 字符宽度（em），未列出的可打印字符按 0.55 计算
+_ASCII_ADVANCES = {
+    ' ': 0.26, '!': 0.27, '"': 0.4, "'": 0.22, '(': 0.3, ')': 0.3, ',': 0.25, '-': 0.33, '.': 0.25,
+    '/': 0.37, ':': 0.25, ';': 0.25, '[': 0.3, ']': 0.3, '`': 0.3, '{': 0.3, '|': 0.25, '}': 0.3,
+    'I': 0.27, 'J': 0.27, 'M': 0.89, 'W': 0.92, 'f': 0.33, 'i': 0.24, 'j': 0.24, 'l': 0.24,
+    'm': 0.84, 'r': 0.36, 't': 0.34, 'w': 0.76, '%': 0.84, '@': 0.93, '&': 0.68,
+}
+_DEFAULT_ADVANCE = 0.55
+
+# 拉丁单词、数字（含内部的连字符、撇号和小数点）、空白或单个其他字符
+_UNIT = re.compile(r"[0-9A-Za-zÀ-ɏ]+(?:[-'.][0-9A-Za-zÀ-ɏ]+)*|\s+|.", re.S)
+
+_advances: Optional[array] = None
+
+
+def _advance_table() -> array:
+    """基本多文种平面内每个码位的字宽，首次使用时构建（约几毫秒）"""
+    global _advances
+    if _advances is None:
+        table = array('f', [_DEFAULT_ADVANCE]) * 0x10000
+        for cp in range(0x10000):
+            ch = chr(cp)
+            if cp < 0x80:
+                table[cp] = _ASCII_ADVANCES.get(ch, _DEFAULT_ADVANCE) if cp >= 0x20 else 0.0
+            elif unicodedata.combining(ch) or unicodedata.category(ch) in ('Mn', 'Me', 'Cf'):
+                table[cp] = 0.0
+            elif unicodedata.east_asian_width(ch) in ('W', 'F', 'A'):
+                table[cp] = 1.0
+        _advances = table
+    return _advances
+
+
+def text_width(text: str) -> float:
+    """文字宽度（em）；基本多文种平面以外的字符（扩展汉字、表情等）按全角计算"""
+    table = _advance_table()
+    return sum(table[cp] if cp < 0x10000 else 1.0 for cp in map(ord, text))
+
+
+def _split_to_width(unit: str, max_width: float) -> List[str]:
+    """把宽于一行的单元（如很长的英文单词）按字符拆开"""
+    pieces, current, width = [], '', 0.0
+    for ch in unit:
+        w = text_width(ch)
+        if current and width + w > max_width:
+            pieces.append(current)
+            current, width = '', 0.0
+        current += ch
+        width += w
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def wrap(text: str, max_width: float, break_after: str = DEFAULT_BREAK_AFTER) -> List[str]:
+    """
+    按宽度换行，max_width 的单位为 em
+
+    连续空白视为一个可断行的空格，行首行尾的空格会被去掉。每行最多悬挂一个避头标点；
+    再有避头标点时，连同它前面的一个字一起移到下一行。
+    """
+    lines: List[str] = []
+    current: List[str] = []
+    width = 0.0
+    space_pending = False
+    break_pending = False
+    space_width = text_width(' ')
+
+    def flush():
+        nonlocal current, width
+        if current:
+            lines.append(''.join(current))
+        current, width = [], 0.0
+
+    for unit in _UNIT.findall(text):
+        if unit.isspace():
+            space_pending = bool(current) and not break_pending
+            continue
+        if break_pending:
+            # 强制换行处后面紧跟的避头标点（如 “。”” 的后引号）仍留在本行，
+            # 但同样最多悬挂一个；再多时按下面的超宽规则连同前一个字移到下一行
+            if unit in NO_LINE_START and width <= max_width:
+                current.append(unit)
+                width += text_width(unit)
+                continue
+            break_pending = False
+            if unit not in NO_LINE_START:
+                flush()
+        unit_width = text_width(unit)
+        gap = space_width if space_pending else 0.0
+        space_pending = False
+
+        if current and width + gap + unit_width > max_width:
+            if unit in NO_LINE_START and width <= max_width:
+                # 句末标点悬挂在行尾，不移到下一行行首
+                current.append(unit)
+                width += unit_width
+                break_pending = unit in break_after
+                continue
+            carried = []
+            if unit in NO_LINE_START:
+                # 已经悬挂过标点，把行尾的标点和它前面的一个字一起移到下一行
+                while len(current) > 1 and current[-1] in NO_LINE_START:
+                    carried.insert(0, current.pop())
+                if len(current) > 1:
+                    carried.insert(0, current.pop())
+            # 前引号、前括号随下一行一起换行
+            while current and current[-1] in NO_LINE_END:
+                carried.insert(0, current.pop())
+            carried_width = text_width(''.join(carried))
+            if not current or carried_width + unit_width > max_width:
+                # 整行都要移走（如一串前括号）或移走后下一行仍放不下时不再移动，宁可违反避头尾也不超宽
+                current.extend(carried)
+                carried, carried_width = [], 0.0
+            if current and current[-1] == ' ':
+                current.pop()
+            if current:
+                flush()
+            current = carried
+            width = carried_width
+            gap = 0.0
+
+        if not current and unit_width > max_width:
+            pieces = _split_to_width(unit, max_width)
+            for piece in pieces[:-1]:
+                lines.append(piece)
+            unit = pieces[-1]
+            unit_width = text_width(unit)
+        elif gap:
+            current.append(' ')
+            width += gap
+        current.append(unit)
+        width += unit_width
+        break_pending = unit in break_after
+    flush()
+    return lines
+
+
+def _truncate(line: str, max_width: float) -> str:
+    """截断到 max_width 以内并以省略号结尾"""
+    limit = max_width - text_width(ELLIPSIS)
+    while line and text_width(line) > limit:
+        line = line[:-1]
+    return line.rstrip(' ' + ''.join(NO_LINE_END)).rstrip(DEFAULT_BREAK_AFTER) + ELLIPSIS
+
+
+class Layout(NamedTuple):
+    font_size: float
+    line_height: float
+    lines: Tuple[str, ...]
+    truncated: bool
+
+
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def layout_text(text: str, box_width: float, box_height: float, max_font_size: float = 8.0,
+                min_font_size: float = 5.0, font_step: float = 0.5, line_spacing: float = 2.0,
+                min_line_spacing: float = 1.25, break_after: str = DEFAULT_BREAK_AFTER) -> Layout:
+    """
+    在 box_width × box_height 的文本框内排版
+
+    从 max_font_size 开始，行高取 line_spacing 倍字号，行数多时压缩到不小于
+    min_line_spacing 倍字号；仍放不下就按 font_step 缩小字号，直到 min_font_size。
+    """
+    text = ' '.join(text.split())
+    size = max_font_size
+    while True:
+        lines = wrap(text, box_width / size, break_after)
+        line_height = min(size * line_spacing, box_height / max(1, len(lines)))
+        if line_height >= size * min_line_spacing:
+            return Layout(size, line_height, tuple(lines), False)
+        if size - font_step < min_font_size - 1e-9:
+            break
+        size = round(size - font_step, 4)
+
+    max_lines = max(1, int(box_height // (size * min_line_spacing)))
+    kept = lines[:max_lines]
+    kept[-1] = _truncate(kept[-1], box_width / size)
+    return Layout(size, box_height / max_lines, tuple(kept), True)